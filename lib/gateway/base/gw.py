@@ -1,12 +1,24 @@
 """
 Module implements a base gateway class powered by requests module.
+Records of main_logger are handed to a QueueListener thread
+(see config/logging.yaml), so handler I/O stays off request threads.
 """
 import atexit
+import copy
 import logging
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from email import utils as email_utils
+from types import MappingProxyType
 from typing import Optional, Union
 
+import orjson
 import requests
-import retry
+from requests import adapters
+from urllib3.util import retry as urllib3_retry
 
 from lib.gateway.base import rps_limiter
 from lib.internal import timer
@@ -24,6 +36,39 @@ _NAME_TO_MODE = {
     "method": RPS_PARSE_BY_METHOD_MODE,
     "blanket": RPS_PARSE_BLANKET_MODE
 }
+# retry settings
+RETRY_TRIES = 10
+RETRY_DELAY = 1
+RETRY_BACKOFF = 2
+RETRY_MAX_DELAY = 30
+RETRY_JITTER = (0, 1)
+# methods that are safe to resend after a server error
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS"))
+# statuses meaning the request was not processed, so any method is resent
+UNPROCESSED_STATUSES = frozenset((502, 503, 504))
+# rate limited requests are rejected unprocessed, so they are always resent
+TOO_MANY_REQUESTS_STATUS = 429
+RETRY_AFTER_HEADER = "Retry-After"
+JSON_CONTENT_TYPE = "application/json"
+# connection pool sizing. Pools block once POOL_MAXSIZE connections
+# to a host are busy instead of opening extra throwaway sockets
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 64
+POOL_BLOCK = True
+# failed connection attempts are retried by urllib3 right away: the request
+# never reached the server, so this is safe for any method and stays out of
+# the status based retry loop below
+CONNECT_RETRY = urllib3_retry.Retry(total=None, connect=3, read=False,
+                                    status=0, other=0, backoff_factor=0.2)
+# applied to every pooled socket: no Nagle delays, detect dead peers
+SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+
+# session shared by clients that don't own one
+_SHARED_SESSION = None
+_SHARED_SESSION_LOCK = threading.Lock()
 
 
 class ClientError(Exception):
@@ -39,16 +84,51 @@ class UnexpectedStatusCodeError(Exception):
     pass
 
 
+def _build_status_table() -> tuple:
+    "Maps status codes below 600 to exception classes, None means ok"
+    table = [UnexpectedStatusCodeError] * 600
+    table[200] = None
+    table[400:500] = [ClientError] * 100
+    table[500:600] = [ServerError] * 100
+    return tuple(table)
+
+
+_STATUS_TO_EXCEPTION = _build_status_table()
+
+
+def status_to_exception_class(status_code: int) -> Optional[type]:
+    "Returns exception class for a status code, None for 200"
+    if 0 <= status_code < 600:
+        return _STATUS_TO_EXCEPTION[status_code]
+    return UnexpectedStatusCodeError
+
+
+class SocketOptionsAdapter(adapters.HTTPAdapter):
+    "HTTPAdapter applying SOCKET_OPTIONS to the connections it opens"
+
+    def init_poolmanager(self, *args, **kwargs):  # noqa: D102
+        kwargs["socket_options"] = SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
 class HTTPClient:
     "Wrapper on top requests module to interact with http APIs"
+    # False hands 429 responses to the caller instead of waiting them out
+    retry_on_429 = True
 
     def __init__(self, timeout: int,
                  use_session: Optional[bool] = None,
                  rps_config: Optional[dict] = None,
-                 rps_config_parsing_mode: Optional[Union[int,str]] = None):
-        "Constructor"
+                 rps_config_parsing_mode: Optional[Union[int,str]] = None,
+                 pool_maxsize: Optional[int] = None):
+        """
+        Constructor. pool_maxsize sizes per host pools of an owned session,
+        clients on the shared session get POOL_MAXSIZE
+        """
         if use_session is None:
             use_session = True
+        if pool_maxsize is None:
+            pool_maxsize = POOL_MAXSIZE
         log.debug(
             "instantiating HTTP client with timeout %s, rps config %s and parsing mode %s",
             timeout, rps_config, rps_config_parsing_mode
@@ -61,8 +141,28 @@ class HTTPClient:
             self._parse_rps_config(cfg=rps_config, mode=rps_config_parsing_mode)
         if use_session:
             log.debug("instantiating gw with session")
-            self.sesh = requests.session()
+            self.sesh = self._new_session(pool_maxsize=pool_maxsize)
             atexit.register(self.sesh.close)
+        else:
+            log.debug("instantiating gw with shared session")
+            self.sesh = _get_shared_session()
+
+    @staticmethod
+    def _new_session(pool_maxsize: Optional[int] = None) -> requests.Session:
+        """
+        Builds the session used to send requests.
+        Subclasses can override this to tune the transport.
+        """
+        if pool_maxsize is None:
+            pool_maxsize = POOL_MAXSIZE
+        sesh = requests.Session()
+        adapter = SocketOptionsAdapter(pool_connections=POOL_CONNECTIONS,
+                                       pool_maxsize=pool_maxsize,
+                                       pool_block=POOL_BLOCK,
+                                       max_retries=CONNECT_RETRY)
+        sesh.mount("http://", adapter)
+        sesh.mount("https://", adapter)
+        return sesh
 
     @staticmethod
     def _parse_mode(mode: Union[int,str]) -> int:
@@ -82,7 +182,6 @@ class HTTPClient:
         if mode is None:
             mode = RPS_PARSE_BLANKET_MODE
         self.mode = self._parse_mode(mode=mode)
-        rps_setup = {}
         mode_name = _MODE_TO_NAME[self.mode]
         log.debug("rps config mode name %s", mode_name)
         # base
@@ -91,72 +190,137 @@ class HTTPClient:
                       mode_name)
             self.base_rps_limiter = rps_limiter.ThreadingLimiter(**cfg)
             return
-        for key, setup in cfg[mode_name].items():
-            rps_setup[key] = rps_limiter.ThreadingLimiter(**setup)
+        # request methods are matched case insensitively
+        rps_setup = {key.lower(): rps_limiter.ThreadingLimiter(**setup)
+                     for key, setup in cfg[mode_name].items()}
         # by method
         if self.mode == RPS_PARSE_BY_METHOD_MODE:
             log.debug("rps parsing mode: %s. Setting limiters by method: %s",
                       mode_name, rps_setup)
-            self.rps_by_method = rps_setup
+            # read-only view: limiters are shared by threads, no swapping
+            self.rps_by_method = MappingProxyType(rps_setup)
             return
 
     @staticmethod
     def response_to_exception(r: requests.Response) -> Exception:
         "Converts status code of a response to an exception"
-        if r.status_code == 200:
+        if (cls := status_to_exception_class(r.status_code)) is None:
             return
-        msg = f"status code: {r.status_code}. details: {r.text}"
-        if 400 <= r.status_code < 500:
-            return ClientError(msg)
-        elif 500 <= r.status_code < 600:
-            return ServerError(msg)
-        else:
-            return UnexpectedStatusCodeError(msg)
+        return cls(f"status code: {r.status_code}. details: {r.text}")
     
-    @retry.retry(exceptions=(ServerError, UnexpectedStatusCodeError),
-                 backoff=2, tries=10, delay=1, logger=log)
     def _make_request(
         self,
-        req: requests.Request,
+        prep: requests.PreparedRequest,
         limiter: Optional[rps_limiter.ThreadingLimiter] = None
     ) -> requests.Response:
-        log.debug("making %s req to %s", req.method, req.url)
-        sesh = self.sesh if self.sesh is not None else requests.session()
+        "Sends a single request without checking response status"
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("making %s req to %s", prep.method, prep.url)
         if limiter is None:
             with timer.TimerContext() as t:
-                r = sesh.send(
-                    request=sesh.prepare_request(request=req),
-                    timeout=self.timeout
-                )
+                r = self.sesh.send(request=prep, timeout=self.timeout)
         else:
             with limiter:
                 with timer.TimerContext() as t:
-                    r = sesh.send(
-                        request=sesh.prepare_request(request=req),
-                        timeout=self.timeout
-                    )
-        log.debug(
-            "%s to %s resulted in %s status response in %s seconds",
-            req.method, req.url, r.status_code, t.elapsed
-        )
+                    r = self.sesh.send(request=prep, timeout=self.timeout)
+        if debug:
+            log.debug(
+                "%s to %s resulted in %s status response in %s seconds",
+                prep.method, prep.url, r.status_code, t.elapsed
+            )
+        return r
+
+    @staticmethod
+    def _retry_after(r: requests.Response) -> Optional[float]:
+        """
+        Parses Retry-After header of a response to seconds.
+        Both delta-seconds and HTTP-date forms are supported.
+        Past dates give 0, the server's delay is otherwise kept as is.
+        """
+        if (value := r.headers.get(RETRY_AFTER_HEADER)) is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = email_utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                log.debug("unparsable %s header: %s",
+                          RETRY_AFTER_HEADER, value)
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            seconds = (retry_at - datetime.now(tz=timezone.utc)).total_seconds()  # noqa: E501
+        return max(float(0), seconds)
+
+    def _is_retriable(self, prep: requests.PreparedRequest,
+                      r: requests.Response) -> bool:
+        """
+        Tells if a request is worth resending based on response status.
+        429 (unless retry_on_429 is off) and statuses mapped to
+        ServerError or UnexpectedStatusCodeError qualify. Non-idempotent
+        requests are only resent when the server did not process them
+        or asked us to come back later.
+        """
+        if r.status_code == TOO_MANY_REQUESTS_STATUS:
+            return self.retry_on_429
+        if status_to_exception_class(r.status_code) not in (
+            ServerError, UnexpectedStatusCodeError
+        ):
+            return False
+        return (prep.method.upper() in IDEMPOTENT_METHODS
+                or r.status_code in UNPROCESSED_STATUSES
+                or RETRY_AFTER_HEADER in r.headers)
+
+    def _make_request_with_retries(
+        self,
+        prep: requests.PreparedRequest,
+        limiter: Optional[rps_limiter.ThreadingLimiter] = None
+    ) -> requests.Response:
+        """
+        Calls _make_request until the response is not retriable or tries
+        are exhausted. Waits for Retry-After when the server provides it
+        and for jittered exponential backoff capped at RETRY_MAX_DELAY
+        otherwise. Exceptions are
+        only built for the final response. The same prepared request
+        is resent on every attempt.
+        """
+        delay = RETRY_DELAY
+        for attempt in range(1, RETRY_TRIES+1):
+            r = self._make_request(prep=prep, limiter=limiter)
+            if attempt == RETRY_TRIES or not self._is_retriable(prep=prep,
+                                                                r=r):
+                break
+            if (to_sleep := self._retry_after(r=r)) is None:
+                to_sleep = min(delay + random.uniform(*RETRY_JITTER),
+                               RETRY_MAX_DELAY)
+                delay *= RETRY_BACKOFF
+            log.warning("%s to %s got status %s, retrying in %s seconds...",
+                        prep.method, prep.url, r.status_code, to_sleep)
+            time.sleep(to_sleep)
         if (e := self.response_to_exception(r=r)) is None:
             return r
-        raise e # trigger decorator
-    
-    def _request_wrapper(self, req: requests.Request) -> requests.Response:
+        raise e
+
+    def _request_wrapper(
+        self,
+        prep: requests.PreparedRequest
+    ) -> requests.Response:
         # choose limiter
         limiter = None
         if self.rps_by_method is not None:
-            log.debug("rps limiting by method is enabled")
-            limiter = self.rps_by_method.get(req.method.lower(), None)
-            log.debug("limiter %s was selected by request method name %s",
-                      limiter, req.method.lower())
+            method = prep.method.lower()
+            limiter = self.rps_by_method.get(method, None)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("limiter %s was selected by request method name %s",
+                          limiter, method)
         elif self.base_rps_limiter is not None:
-            log.debug("base rps limiting is enabled")
             limiter = self.base_rps_limiter
-            log.debug("limiter %s was selected based on self.base_rps_limiter attr",
-                      limiter)
-        return self._make_request(req=req, limiter=limiter)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("limiter %s was selected based on self.base_rps_limiter attr",  # noqa: E501
+                          limiter)
+        return self._make_request_with_retries(prep=prep, limiter=limiter)
     
     def make_request(self, req: requests.Request) -> requests.Response:
         """Combines private methods to execute an HTTP request.
@@ -167,19 +331,66 @@ class HTTPClient:
         Raises:
             e: ClientError | ServerError | UnexpectedStatusCodeError
 
+        Returns:
+            requests.Response: server response
+        """
+        return self.send_prepared(prep=self.make_prepared(req=req))
+
+    def make_prepared(self, req: requests.Request) -> requests.PreparedRequest:
+        """
+        Prepares a request with session state (cookies, headers).
+        The result can be passed to send_prepared repeatedly.
+        """
+        return self.sesh.prepare_request(request=self._encode_json_body(req))
+
+    @staticmethod
+    def _encode_json_body(req: requests.Request) -> requests.Request:
+        """
+        Serializes json payload of a request with orjson.
+        Works on a shallow copy, the caller's request is left as is.
+        A Content-Type set by the caller is kept. Non-str dict keys are
+        stringified, as the stdlib json encoder used by requests does
+        """
+        if req.json is None or req.data:
+            return req
+        encoded = copy.copy(req)
+        encoded.headers = dict(req.headers)
+        if not any(k.lower() == "content-type" for k in encoded.headers):
+            encoded.headers["Content-Type"] = JSON_CONTENT_TYPE
+        encoded.data = orjson.dumps(req.json, option=orjson.OPT_NON_STR_KEYS)
+        encoded.json = None
+        return encoded
+
+    def send_prepared(
+        self,
+        prep: requests.PreparedRequest
+    ) -> requests.Response:
+        """Executes a request prepared with make_prepared.
+
+        Args:
+            prep (requests.PreparedRequest): request to execute
+
+        Raises:
+            e: ClientError | ServerError | UnexpectedStatusCodeError
+
         Returns:
             requests.Response: server response
         """
         try:
-            return self._request_wrapper(req=req)
+            return self._request_wrapper(prep=prep)
         except Exception as e:
             log.error("request failed despite retries: %s", e)
             raise e
 
-    
-
-        
-
-
-        
 
+def _get_shared_session() -> requests.Session:
+    """
+    Lazily creates a process wide session so clients instantiated
+    with use_session=False still reuse connections across requests.
+    """
+    global _SHARED_SESSION
+    with _SHARED_SESSION_LOCK:
+        if _SHARED_SESSION is None:
+            _SHARED_SESSION = HTTPClient._new_session()
+            atexit.register(_SHARED_SESSION.close)
+        return _SHARED_SESSION
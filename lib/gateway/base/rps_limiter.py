@@ -10,18 +10,29 @@ log = logging.getLogger("main_logger")
 
 class ThreadingLimiter:
     """
-    RPS limiter using threading.Lock.
+    GCRA (virtual scheduling) RPS limiter using threading.Lock.
     Usage:
-        limiter = ThreadingLimiter(RPS, # of concurrent requests)
+        limiter = ThreadingLimiter(RPS, # of concurrent requests, burst)
         with limiter:
             ...logic that needs to be throttled...
     """
-    def __init__(self, rps: float, concurrent_requests: Optional[int] = None):
+    # fixed attribute layout keeps lookups on the hot path cheap
+    __slots__ = ("rps", "burst", "rps_lock", "interval_ns", "tolerance_ns",
+                 "tat_ns", "concurrency", "sem")
+
+    def __init__(self, rps: float, concurrent_requests: Optional[int] = None,
+                 burst: Optional[int] = None):
         """Constructor"""
+        if burst is None:
+            burst = 1
         self.rps = rps
+        self.burst = burst
         self.rps_lock = threading.Lock()
-        self.interval_ms = 1000/rps
-        self.last_request_time = time.time() * 1000
+        self.interval_ns = int(1e9 / rps)
+        # how far ahead of schedule a request is allowed to go
+        self.tolerance_ns = (burst-1) * self.interval_ns
+        # theoretical arrival time of the next request
+        self.tat_ns = time.monotonic_ns()
 
         self.concurrency = False
         self.sem = None
@@ -29,17 +40,25 @@ class ThreadingLimiter:
             self.concurrency = True
             self.sem = threading.Semaphore(concurrent_requests)
 
+    def _reserve(self) -> float:
+        """
+        Reserves a slot for the caller.
+        Returns seconds to wait until the slot is reached.
+        """
+        with self.rps_lock:
+            now = time.monotonic_ns()
+            tat = self.tat_ns
+            arrival = max(now, tat-self.tolerance_ns)
+            self.tat_ns = max(tat, arrival) + self.interval_ns
+        return (arrival - now) / 1e9
+
     def __enter__(self):  # noqa: D105
         if self.concurrency:
             self.sem.acquire()
-        with self.rps_lock:
-            to_sleep = max(
-                float(0),
-                self.interval_ms-((time.time() * 1000)-self.last_request_time)
-            ) / 1000
+        # sleeping happens outside of the lock so other threads can proceed
+        if (to_sleep := self._reserve()) > 0:
             log.debug("sleeping for %s due to RPS config", to_sleep)
             time.sleep(to_sleep)
-            self.last_request_time = time.time() * 1000
 
     def __exit__(self, exc_type, exc, tb):  # noqa: D105
         if self.concurrency:
@@ -47,4 +66,4 @@ class ThreadingLimiter:
 
     def __str__(self):
         "Helps with printing and logging class info"
-        return f"ThreadingLimiter(rps={self.rps}, concurrency={self.concurrency})"  # noqa: E501
\ No newline at end of file
+        return f"ThreadingLimiter(rps={self.rps}, concurrency={self.concurrency}, burst={self.burst})"  # noqa: E501
\ No newline at end of file
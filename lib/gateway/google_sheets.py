@@ -2,18 +2,23 @@
 """
 Module implements Gsheet API gateway.
 """
+import functools
+import itertools
 import logging
 from typing import List, Optional
 import socket
+import threading
+import time
 
 import google_auth_httplib2
 import httplib2
+import orjson
 import polars as pl
-import retry
 from apiclient import discovery
 from google.oauth2 import service_account
 from googleapiclient import errors as google_errors
 from googleapiclient import http as google_http
+from googleapiclient import model as google_model
 
 from lib.gateway.base import rps_limiter
 from lib.internal import timer
@@ -26,9 +31,25 @@ SHEET_SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 SUPPORTED_POLARS_TYPES = {"Int64", "Float64", "Utf8", "Int32"}
+# Column letters A..ZZ indexed by column number - 1
+_COL_LETTERS = tuple(
+    [chr(65+i) for i in range(26)]
+    + [chr(65+a) + chr(65+b) for a in range(26) for b in range(26)]
+)
+# Retry settings
+RETRY_TRIES = 10
+RETRY_DELAY = 1
+RETRY_BACKOFF = 2
+RETRY_AFTER_HEADER = "retry-after"
 # Request types
 R_REQUEST = 1
 W_REQUEST = 2
+# Seconds parsed sheet properties are served from the cache
+PROPERTIES_TTL = 60
+# Partial response mask for reading tab values together with tab properties
+GRID_VALUES_FIELDS = (
+    "sheets(properties(sheetId,title),data(rowData(values(formattedValue))))"
+)
 
 
 class GoogleSheetRetriableError(Exception):
@@ -41,19 +62,43 @@ class GoogleSheetRetriableError(Exception):
         self.og_exception = og_exception
 
 
+class OrjsonModel(google_model.JsonModel):
+    "JsonModel (de)serializing bodies with orjson instead of stdlib json"
+
+    def serialize(self, body_value) -> str:
+        "Dumps a request body to a JSON string, wrapping it like JsonModel"
+        if (isinstance(body_value, dict) and "data" not in body_value
+                and self._data_wrapper):
+            body_value = {"data": body_value}
+        return orjson.dumps(body_value).decode("utf-8")
+
+    def deserialize(self, content):
+        "Loads a response body, content is returned as is if not JSON"
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            if isinstance(content, bytes):
+                content = content.decode("utf-8")
+            return content
+        if self._data_wrapper and "data" in body:
+            body = body["data"]
+        return body
+
+
 class GoogleSheetMapper:
     "Encapsulates mapper methods that are used by GoogleSheetsGateway."
 
     @staticmethod
     def num_to_sheet_range(num: int) -> str:
         """
-        Mapper converting col number to a spreadsheet column
+        Mapper converting col number to a spreadsheet column.
+        Raises ValueError for numbers outside of A:ZZ
         """
-        rem, layers = num % 26, num // 26
-        first = ""
-        if layers > 0:
-            first = chr(65+layers-1)
-        return f"{first}{chr(65+rem-1)}"
+        if not 1 <= num <= len(_COL_LETTERS):
+            raise ValueError(
+                f"column number {num} is out of range 1-{len(_COL_LETTERS)}"
+            )
+        return _COL_LETTERS[num-1]
 
     @staticmethod
     def _sheet_values_to_header_and_rows(sheet_values: list, header_rownum: int,
@@ -64,8 +109,9 @@ class GoogleSheetMapper:
         """
         header_index = header_rownum-1
         header = sheet_values[header_index]
-        # Drop rows we want to skip based on params
-        del sheet_values[header_index:header_rownum+header_offset]
+        # Drop rows we want to skip based on params without mutating input
+        sheet_values = (sheet_values[:header_index]
+                        + sheet_values[header_rownum+header_offset:])
         # All rows have values for all columns
         if (len(sheet_values) == 0
             or (hlen := len(header)) == len(sheet_values[0])):
@@ -75,9 +121,9 @@ class GoogleSheetMapper:
             "row data len %s does not match header len %s. Expanding...",
             len(sheet_values[0]), hlen
         )
-        for row in sheet_values:
-            for i in range(hlen-len(row)):
-                row.append(None)
+        pad = [None] * hlen
+        sheet_values = [row + pad[len(row):] if len(row) < hlen else row
+                        for row in sheet_values]
         return header, sheet_values
     
     @staticmethod
@@ -102,16 +148,16 @@ class GoogleSheetMapper:
                 for col, col_setup in schema.items()]
     
     @staticmethod
-    def _parse_col(df: pl.DataFrame, col: str, col_type: str) -> tuple:
+    def _parse_col(col: str, col_type: str) -> tuple:
         """
-        Parses a single column of a polars df to a specified type
+        Builds an expression parsing a single string column
+        of a polars df to a specified type
 
         Args:
-            df: raw df with all columns being strings
             col: column to parse
             col_type: target type
         Returns:
-             df with all columns properly typed
+             tuple(polars expression, err if any)
         """
         # Doing checks in advance to avoid unnecessary work
         if col_type not in SUPPORTED_POLARS_TYPES:
@@ -125,42 +171,80 @@ class GoogleSheetMapper:
         # At this point know the column is of a supported type
         col_obj = pl.col(col)
         log.debug("Parsing %s column to type %s", col, dtype)
-        df = df.with_columns(
-            pl.when(col_obj == "")
-            .then(pl.lit(value=None, dtype=dtype))
-            .otherwise(col_obj)
-            .alias(name=col)
-        )
-        log.debug("Filled empty strings with nulls")
-        if col_type == "Utf8":
-            return df, None
-        elif "int" in col_type.lower():
-            return df.with_columns(col_obj.cast(dtype=dtype)
-                                   .alias(name=col)), None
+        # Empty strings become nulls within the same expression as the cast
+        expr = col_obj.replace("", None)
+        if "int" in col_type.lower():
+            expr = expr.cast(dtype=dtype)
         elif "float" in col_type.lower():
-            return df.with_columns(
-                col_obj.str.replace(pattern="%", value="", literal=True)
-                .cast(dtype=dtype)
-                .alias(name=col) / 100
-            ), None
+            expr = expr.str.strip_suffix("%").cast(dtype=dtype) / 100
+        return expr.alias(name=col), None
 
-    def parse_cols(self, df: pl.DataFrame, schema: dict):
-        "TODO"
+    @staticmethod
+    def _schema_to_parse_exprs(schema: dict) -> tuple:
+        "Builds parsing expressions for all schema columns"
+        exprs = []
         for col, col_setup in schema.items():
             try:
-                df, e = self._parse_col(df=df, col=col,
-                                        col_type=col_setup["type"])
-                if e is not None:
-                    log.error("Error parsing %s column: %s", col, e)
-                    return None, e
+                expr, e = GoogleSheetMapper._parse_col(
+                    col=col, col_type=col_setup["type"]
+                )
             except Exception as e:
                 log.error("Unhandled error parsing %s column: %s", col, e)
                 return None, e
-        return df, None
+            if e is not None:
+                log.error("Error parsing %s column: %s", col, e)
+                return None, e
+            exprs.append(expr)
+        return exprs, None
+
+    @staticmethod
+    def _unparsable_col(df: pl.DataFrame, exprs: list) -> Optional[str]:
+        """
+        Slow path for a failed fused parse:
+        evaluates expressions one by one to name the offending column
+        """
+        for expr in exprs:
+            try:
+                df.select(expr)
+            except Exception:
+                return expr.meta.output_name()
+        return None
+
+    def parse_cols(self, df: pl.DataFrame, schema: dict):
+        "Typecasts all schema columns of df in a single with_columns pass"
+        exprs, e = self._schema_to_parse_exprs(schema=schema)
+        if e is not None:
+            return None, e
+        try:
+            return df.with_columns(exprs), None
+        except Exception as e:
+            log.error("Unhandled error parsing %s column: %s",
+                      self._unparsable_col(df=df, exprs=exprs), e)
+            return None, e
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _compile_schema(schema_key: tuple) -> tuple:
+        """
+        Builds alias and parsing expressions for a schema given as
+        a tuple of (col, sheet_name, type). Memoized since expressions
+        depend on the schema only.
+
+        Returns:
+            tuple(alias expressions, parsing expressions, err if any)
+        """
+        schema = {col: {"sheet_name": sheet_name, "type": col_type}
+                  for col, sheet_name, col_type in schema_key}
+        pl_aliases = GoogleSheetMapper._sheet_schema_to_pl_aliases(
+            schema=schema
+        )
+        exprs, e = GoogleSheetMapper._schema_to_parse_exprs(schema=schema)
+        return pl_aliases, exprs, e
 
     def typecast_df(self, df: pl.DataFrame, schema: dict) -> tuple:
         """
-        Typecasts df columns based on schema
+        Typecasts df columns based on schema.
+        Projection and casts run as a single lazy plan.
 
         Args:
             df: polars df (untyped)
@@ -171,14 +255,33 @@ class GoogleSheetMapper:
         """
         log.debug("typecasting with schema %s", schema)
         try:
-            pl_aliases = self._sheet_schema_to_pl_aliases(schema=schema)
+            schema_key = tuple(
+                (col, col_setup["sheet_name"], col_setup["type"])
+                for col, col_setup in schema.items()
+            )
         except Exception as e:
             log.error("Error parsing schema to aliases: %s", e)
             return None, e
-        df = df.select(pl_aliases)
+        pl_aliases, exprs, e = self._compile_schema(schema_key=schema_key)
+        if e is not None:
+            return None, e
         log.debug("Parsing columns")
-        return self.parse_cols(df=df, schema=schema)
-
+        try:
+            return (df.lazy()
+                    .select(pl_aliases)
+                    .with_columns(exprs)
+                    .collect()), None
+        except Exception as e:
+            log.error("Unhandled error typecasting df: %s", e)
+            err = e
+        try:
+            df = df.select(pl_aliases)
+        except Exception:
+            # Projection itself failed, the error above names the column
+            return None, err
+        log.error("Failed parsing %s column",
+                  self._unparsable_col(df=df, exprs=exprs))
+        return None, err
 
     @staticmethod
     def _tab_name_to_tab_id(tab_name: str, tab_properties: dict):
@@ -227,22 +330,38 @@ class GoogleSheetMapper:
         }
 
     @staticmethod
-    def _df_to_rows_update(data: pl.DataFrame, include_header: bool) -> list:
+    def _series_to_strings(s: pl.Series) -> list:
         """
-        Mapper converting df to a 2d list that Google understands
+        Converts series values to strings the same way str() does.
+        Text and integer columns are cast by polars, the rest in python.
         """
+        if s.dtype == pl.Utf8 or s.dtype.is_integer():
+            return s.cast(pl.Utf8).fill_null("None").to_list()
+        return list(map(str, s.to_list()))
 
-        data_update = data.to_numpy().tolist()
+    @staticmethod
+    def _df_to_values(data: pl.DataFrame, include_header: bool) -> list:
+        """
+        Mapper converting df to a 2d list of strings, row by row
+        """
+        rows = zip(*(GoogleSheetMapper._series_to_strings(s)
+                     for s in data.get_columns()))
         if include_header:
-            data_update = [data.columns] + data_update
+            rows = itertools.chain([data.columns], rows)
+        return list(rows)
 
-        rows_update = []
-        for row in data_update:
-            values = []
-            for val in row:
-                values.append({"userEnteredValue": {"stringValue": str(val)}})
-            rows_update.append({"values": values})
-        return rows_update
+    @staticmethod
+    def _df_to_rows_update(data: pl.DataFrame, include_header: bool) -> list:
+        """
+        Mapper converting df to a 2d list that Google understands
+        """
+        rows = GoogleSheetMapper._df_to_values(data=data,
+                                               include_header=include_header)
+        return [
+            {"values": [{"userEnteredValue": {"stringValue": val}}
+                        for val in row]}
+            for row in rows
+        ]
 
     @staticmethod
     def _append_cell_params_to_body(rows: list, tab_id: int) -> dict:
@@ -265,6 +384,57 @@ class GoogleSheetMapper:
             for tab in sheet_properties["sheets"]
         }
     
+    @staticmethod
+    def _grid_data_to_sheet_values(grid_data: list) -> list:
+        """
+        Mapper converting gridData of a spreadsheets.get response
+        to a 2d list of values in the same form as values.get returns.
+        Formatted but empty cells and rows show up in gridData, so trailing
+        empty cells of a row and trailing empty rows are trimmed like
+        values.get does
+        """
+        values = []
+        for grid in grid_data:
+            for row in grid.get("rowData", []):
+                cells = [cell.get("formattedValue", "")
+                         for cell in row.get("values", [])]
+                while cells and cells[-1] == "":
+                    cells.pop()
+                values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _sheet_values_to_data(self, sheet_values: list, header_rownum: int,
+                              header_offset: int, as_df: bool,
+                              schema: dict) -> tuple:
+        """
+        Converts raw sheet values to a 2d list or a (typed) polars df
+        """
+        header, rows = self._sheet_values_to_header_and_rows(
+            sheet_values=sheet_values,
+            header_rownum=header_rownum,
+            header_offset=header_offset
+        )
+        log.debug("Accounted for header row")
+        if not as_df:
+            log.debug("as_df is False, returning as 2d list")
+            return [header] + rows, None
+
+        log.debug("as_df is True, converting to polars")
+        if rows:
+            # Column-oriented construction avoids polars transposing rows,
+            # zip_longest pads rows shorter than the first one with None
+            df = pl.DataFrame(data=list(itertools.zip_longest(*rows)),
+                              schema=header, orient="col")
+        else:
+            df = pl.DataFrame(data=rows, schema=header, orient="row")
+
+        if not schema:
+            log.debug("use_schema is False, returning untyped")
+            return df, None
+        return self.typecast_df(df=df, schema=schema)
+
     @staticmethod
     def _sheet_update_and_range_to_value_range(sheet_range: str,
                                                data_update: list) -> dict:
@@ -312,23 +482,51 @@ class GoogleSheetsGateway(GoogleSheetMapper):
             request_timeout = 60
         self.credentials = self._new_creds(service_acc_path=service_acc_path)
 
-        # TODO abstract this? Do we even needs this as an attribute?
+        self._api_version = api_version
+        self._request_timeout = request_timeout
+        # httplib2.Http is not thread-safe, so each thread gets its own client
         # https://github.com/googleapis/google-api-python-client/issues/480
-        authed_http = google_auth_httplib2.AuthorizedHttp(
-            self.credentials, http=httplib2.Http(timeout=request_timeout)
-        )
-        self.gsheet_client = discovery.build(
-                serviceName="sheets",
-                version=api_version,
-                http=authed_http
-        )
-        self.sheet_service = self.gsheet_client.spreadsheets()
+        self._tls = threading.local()
         self.read_limiter = rps_limiter.ThreadingLimiter(
             rps=read_rps, concurrent_requests=read_concurrency
         )
         self.write_limiter = rps_limiter.ThreadingLimiter(
             rps=write_rps, concurrent_requests=write_concurrency
         )
+        # sheet_id -> (monotonic fetch time, parsed properties)
+        self._props_cache = {}
+        self._props_lock = threading.Lock()
+
+    def _client(self) -> discovery.Resource:
+        "Returns discovery client of the calling thread, builds it if needed"
+        client = getattr(self._tls, "client", None)
+        if client is None:
+            authed_http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials,
+                http=httplib2.Http(timeout=self._request_timeout)
+            )
+            client = discovery.build(
+                serviceName="sheets",
+                version=self._api_version,
+                http=authed_http,
+                model=OrjsonModel(),
+                cache_discovery=False,
+                static_discovery=True
+            )
+            self._tls.client = client
+        return client
+
+    @property
+    def sheet_service(self) -> discovery.Resource:
+        """
+        spreadsheets resource bound to the calling thread's connection.
+        Built once per thread, next to the client
+        """
+        service = getattr(self._tls, "sheet_service", None)
+        if service is None:
+            service = self._client().spreadsheets()
+            self._tls.sheet_service = service
+        return service
 
     @staticmethod
     def _new_creds(service_acc_path: str) -> service_account.Credentials:
@@ -339,40 +537,54 @@ class GoogleSheetsGateway(GoogleSheetMapper):
             filename=service_acc_path, scopes=SHEET_SCOPES
         )
 
-    @retry.retry(exceptions=(GoogleSheetRetriableError,),
-                 backoff=2, tries=10, delay=1, logger=log)
+    @staticmethod
+    def _retry_after(e: google_errors.HttpError) -> float:
+        "Parses Retry-After seconds of an HttpError, 0 if absent or a date"
+        try:
+            return float(e.resp.get(RETRY_AFTER_HEADER) or 0)
+        except ValueError:
+            return 0
+
     def __make_request(self, req: google_http.HttpRequest,
                        rps_limiter: rps_limiter.ThreadingLimiter) -> dict:  # noqa: E501
         """
         Private method simplifying sending API requests to Google Backend.
-        Has some basic retry logic.
+        Retries 429, 5xx and socket timeouts with exponential backoff
+        honoring Retry-After.
 
         Args:
             req: request struct
         """
-        log.debug("Calling %s method for %s", req.methodId, req.uri)
-        try:
-            with rps_limiter:
-                with timer.TimerContext() as t:
-                    res = req.execute()
-            log.debug("Method %s responded in %s seconds", req.methodId, t.elapsed)
-            return res
-        except google_errors.HttpError as e:
-            log.error(
-                "%s method for %s got an error with code %s: %s",
-                req.method, req.uri, e.resp.status, e
-            )
-            if  500 <= e.resp.status < 600:
-                # Triggers a retry
-                raise GoogleSheetRetriableError(
+        delay = RETRY_DELAY
+        for attempt in range(1, RETRY_TRIES+1):
+            log.debug("Calling %s method for %s", req.methodId, req.uri)
+            try:
+                with rps_limiter:
+                    with timer.TimerContext() as t:
+                        res = req.execute()
+                log.debug("Method %s responded in %s seconds", req.methodId, t.elapsed)  # noqa: E501
+                return res
+            except google_errors.HttpError as e:
+                log.error(
+                    "%s method for %s got an error with code %s: %s",
+                    req.method, req.uri, e.resp.status, e
+                )
+                if not (e.resp.status == 429 or 500 <= e.resp.status < 600):
+                    raise e
+                err = GoogleSheetRetriableError(
                     msg="Http error worth retrying", og_exception=e
                 )
-            raise e
-        except socket.timeout as e:
-            msg = f"socked timed out for {req.method} method for {req.uri}" 
-            log.error(msg)
-            raise GoogleSheetRetriableError(msg=msg, og_exception=e)
-
+                to_sleep = max(delay, self._retry_after(e=e))
+            except socket.timeout as e:
+                msg = f"socked timed out for {req.method} method for {req.uri}"  # noqa: E501
+                log.error(msg)
+                err = GoogleSheetRetriableError(msg=msg, og_exception=e)
+                to_sleep = delay
+            if attempt == RETRY_TRIES:
+                raise err
+            log.warning("%s, retrying in %s seconds...", err, to_sleep)
+            time.sleep(to_sleep)
+            delay *= RETRY_BACKOFF
 
     def _make_request(self, sheet_id: str, req: google_http.HttpRequest,
                       req_type: int) -> tuple:
@@ -401,7 +613,7 @@ class GoogleSheetsGateway(GoogleSheetMapper):
         except GoogleSheetRetriableError as e:
             log.error(
                 "Request failed after retries with error %s. Response: %s",
-                e.og_exception, e.og_exception.content
+                e.og_exception, getattr(e.og_exception, "content", None)
             )
             return None, e
         except Exception as e:
@@ -448,25 +660,45 @@ class GoogleSheetsGateway(GoogleSheetMapper):
         if e is not None:
             log.error("read_sheet error for sheet %s: %s", sheet_id, e)
             return None, e
-        sheet_values = resp["values"]
-        header, rows = self._sheet_values_to_header_and_rows(
-            sheet_values=sheet_values,
+        return self._sheet_values_to_data(
+            sheet_values=resp["values"],
             header_rownum=header_rownum,
-            header_offset=header_offset
+            header_offset=header_offset,
+            as_df=as_df,
+            schema=schema
         )
-        log.debug("Accounted for header row")
-        if not as_df:
-            log.debug("as_df is False, returning as 2d list")
-            return [header] + rows, None
 
-        log.debug("as_df is True, converting to polars")
-        df = pl.DataFrame(data=rows, schema=header,
-                          orient="row", infer_schema_length=len(rows))
+    def _read_sheet_with_properties(self, sheet_id: str,
+                                    tab_name: str) -> tuple:
+        """
+        Reads tab values and tab properties in a single round-trip
 
-        if not schema:
-            log.debug("use_schema is False, returning untyped")
-            return df, None
-        return self.typecast_df(df=df, schema=schema)
+        Args:
+            sheet_id: spreadsheet id
+            tab_name: tab to read from in the sheet
+
+        Returns:
+            tuple(tab properties, 2d list of values, err if any)
+        """
+        req = self.sheet_service.get(spreadsheetId=sheet_id,
+                                     ranges=[f"{tab_name}!A:ZZ"],
+                                     includeGridData=True,
+                                     fields=GRID_VALUES_FIELDS)
+        resp, e = self._make_request(sheet_id=sheet_id,
+                                     req=req, req_type=R_REQUEST)
+        if e is not None:
+            log.error("read with properties error for sheet %s: %s",
+                      sheet_id, e)
+            return None, None, e
+        try:
+            tab = resp["sheets"][0]
+        except (KeyError, IndexError) as e:
+            log.error("%s tab is not in sheet %s", tab_name, sheet_id)
+            return None, None, e
+        sheet_values = self._grid_data_to_sheet_values(
+            grid_data=tab.get("data", [])
+        )
+        return tab["properties"], sheet_values, None
     
     def batch_update(self, sheet_id: str, requests: List[dict]) -> tuple:
         """
@@ -498,6 +730,13 @@ class GoogleSheetsGateway(GoogleSheetMapper):
         "Fetches properties by sheet_id"
         if return_raw is None:
             return_raw = False
+        if not return_raw:
+            with self._props_lock:
+                cached = self._props_cache.get(sheet_id)
+            if (cached is not None
+                    and time.monotonic() - cached[0] < PROPERTIES_TTL):
+                log.debug("using cached properties for sheet %s", sheet_id)
+                return cached[1], None
         req = self.sheet_service.get(spreadsheetId=sheet_id,
                                      includeGridData=False)
         data, e = self._make_request(sheet_id=sheet_id, req=req,
@@ -508,7 +747,15 @@ class GoogleSheetsGateway(GoogleSheetMapper):
         if return_raw:
             log.debug("parse_by_tab is False, returning raw properties")
             return data, e
-        return self.parse_raw_properties(sheet_properties=data), None
+        sheet_props = self.parse_raw_properties(sheet_properties=data)
+        with self._props_lock:
+            self._props_cache[sheet_id] = (time.monotonic(), sheet_props)
+        return sheet_props, None
+
+    def invalidate_properties(self, sheet_id: str):
+        "Drops cached properties of sheet_id"
+        with self._props_lock:
+            self._props_cache.pop(sheet_id, None)
     
     @staticmethod
     def _compute_number_of_rows_to_drop(current_len: int, new_len: int,
@@ -528,6 +775,9 @@ class GoogleSheetsGateway(GoogleSheetMapper):
             start = 1
         sheet_props, e = self.get_sheet_properties(sheet_id=sheet_id,
                                                    return_raw=False)
+        if e is not None:
+            log.error("deletion failed bc fetching properties failed: %s", e)
+            return e
         try:
             tab_id = sheet_props[tab_name]["sheetId"]
         except KeyError as e:
@@ -536,6 +786,7 @@ class GoogleSheetsGateway(GoogleSheetMapper):
             return e
         req_body = self._delete_rows_params_to_body(tab_id=tab_id, start=start, end=end)  # noqa: E501
         _, e = self.batch_update(sheet_id=sheet_id, requests=[req_body])
+        self.invalidate_properties(sheet_id=sheet_id)
         if e is not None:
             log.error("deletion failed due to batch update error: %s", e)
             return e
@@ -559,34 +810,33 @@ class GoogleSheetsGateway(GoogleSheetMapper):
         if include_header is None:
             include_header = False
         
-        curr_data, e = self.read_sheet(
-            sheet_id=sheet_id,
-            tab_name=tab_name,
-            schema=schema,
-            as_df=True
+        tab_props, sheet_values, e = self._read_sheet_with_properties(
+            sheet_id=sheet_id, tab_name=tab_name
         )
         if e is not None:
             log.error("append failed bc reading sheet failed: %s", e)
             return e
+        curr_data, e = self._sheet_values_to_data(
+            sheet_values=sheet_values,
+            header_rownum=1,
+            header_offset=0,
+            as_df=True,
+            schema=schema if schema is not None else {}
+        )
+        if e is not None:
+            log.error("append failed bc typecasting sheet failed: %s", e)
+            return e
         to_delete = self._compute_number_of_rows_to_drop(
             current_len=len(curr_data), new_len=len(data),
             row_limit=row_limit
         )
         log.debug("%s rows to delete", to_delete)
-        sheet_props, e = self.get_sheet_properties(
-            sheet_id=sheet_id, return_raw=False
-        )
         # preserve order of columns by infering data from what's already in the sheet
         if schema is not None:
             data = data.select(curr_data.columns)
         else:
             data = data.select(curr_data[0])
-        try:
-            tab_id = sheet_props[tab_name]["sheetId"]
-        except KeyError as e:
-            log.error("deletion failed bc %s tab is not in sheet %s",
-                      tab_name, sheet_id)
-            return e
+        tab_id = tab_props["sheetId"]
         batch_ops = [] # container for batch updates
         # delete if needed
         if to_delete > 0:
@@ -605,6 +855,7 @@ class GoogleSheetsGateway(GoogleSheetMapper):
             )
         )
         _, e = self.batch_update(sheet_id=sheet_id, requests=batch_ops)
+        self.invalidate_properties(sheet_id=sheet_id)
         if e is not None:
             log.error("append failed due to batch update error: %s", e)
             return e
@@ -1,11 +1,15 @@
 """
 Module implements client for interacting with DC MIPS api.
 """
+import functools
 import logging
-import re
+import threading
+import time
 from concurrent import futures
 from typing import Callable, List, Optional, Union
 
+import cachetools
+import orjson
 import requests
 
 from lib.gateway.base import gw
@@ -27,9 +31,17 @@ GET_DEVICE_TASKS_PATH = "device/task/list"
 # other module level constants
 CLIENT_LANG = "en"
 JS_NEEDED_SUBSTRING = "trunk_1.0.0 doesn't work properly without JavaScript enabled"  # noqa: E501
+# ascii, so the raw body can be searched without decoding it
+_JS_NEEDED_BYTES = JS_NEEDED_SUBSTRING.encode()
 BACKLIGHT_STATUS_KEY = "is_blacklight"
 THREAD_PREFIX = "mips_"
 DEFAULT_THREAD_COUNT = 20
+# bounds and lifetime (seconds) of cached backlight statuses
+BACKLIGHT_CACHE_SIZE = 4096
+BACKLIGHT_CACHE_TTL = 5.0
+# bounds and lifetime of cached device task lists
+TASK_LIST_CACHE_SIZE = 1024
+TASK_LIST_CACHE_TTL = 2
 
 # request params
 RPC_BACKLIGHT_ON_STATUS = 1
@@ -38,6 +50,8 @@ BACKLIGHT_PARAM_TO_NAME = {
     RPC_BACKLIGHT_ON_STATUS: "backlight_on",
     RPC_BACKLIGHT_OFF_STATUS: "backlight_off"
 }
+# urlencoded body of _patch_backlight_params_to_body, ints need no escaping
+PATCH_BACKLIGHT_FORM = "type=0&id={device_id}&switchStatus={switch_status}"
 
 # modes
 SHADOW_MODE = "shadow"
@@ -50,6 +64,10 @@ class InvalidAUTHError(Exception):
 # entities
 class PatchBacklightAndValidateResult:
     "Represents result of patch_backlight_and_validate method calls"
+    # one instance per device in bulk runs, no per-instance dict needed
+    __slots__ = ("device", "start_ts", "end_ts", "backlight_status",
+                 "error", "mode")
+
     def __init__(
             self,
             device: Optional[int] = None,
@@ -78,25 +96,32 @@ class PatchBacklightAndValidateResult:
             "mode": self.mode
         }
 
+    @staticmethod
+    def to_columns(results: list) -> dict:
+        "Converts a list of instances to a dict of columns"
+        return {
+            "device": [r.device for r in results],
+            "start_ts": [r.start_ts for r in results],
+            "backlight_status": [r.backlight_status for r in results],
+            "end_ts": [r.end_ts for r in results],
+            "error": [r.error for r in results],
+            "mode": [r.mode for r in results]
+        }
+
+
+def needs_auth(method: Callable) -> Callable:
+    "Decorator to enforce auth for calling MIPSClient endpoints requiring it"
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._ok_auth:
+            return method(self, *args, **kwargs)
+        # one thread authenticates, the rest reuse its cookies
+        with self._auth_lock:
+            if not self._ok_auth:
+                self.auth()
+        return method(self, *args, **kwargs)
+    return wrapper
 
-class MIPSTask:
-    "Abstraction for running MIPS requests with concurrent.futures"
-    def __init__(self, fn: Callable, *args, **kwargs):
-        "Constructs a task and saves the func to call within self"
-        self.cancelled = False
-        self.fn = fn
-        self.args = args
-        self.kwargs = kwargs
-    
-    def __call__(self):
-        "Makes instance of this class a function"
-        if self.cancelled:
-            return
-        return self.fn(*self.args, **self.kwargs)
-    
-    def cancel(self):
-        "Cancels a task"
-        self.cancelled = True
 
 #TODO this needs to be decoupled from session!
 class MIPSClient(gw.HTTPClient):
@@ -106,7 +131,8 @@ class MIPSClient(gw.HTTPClient):
                  timeout: int, base_url: str,
                  auto_auth: Optional[bool] = None,
                  rps_config: Optional[dict] = None,
-                 rps_config_parsing_mode: Optional[Union[int,str]] = None):
+                 rps_config_parsing_mode: Optional[Union[int,str]] = None,
+                 pool_maxsize: Optional[int] = None):
         """Instantiates MIPS client
 
         Args:
@@ -114,12 +140,15 @@ class MIPSClient(gw.HTTPClient):
             password (str): password for auth
             timeout (int): timeout of a single request in seconds.
             auto_auth (bool): True means auth is performed on __init__. Defaults to True.
+            pool_maxsize (int, optional): max keep-alive sockets to MIPS and worker threads sharing them. Defaults to gw.POOL_MAXSIZE.
 
         Raises:
             e: _description_
         """  # noqa: E501        
         if auto_auth is None:
             auto_auth = True
+        if pool_maxsize is None:
+            pool_maxsize = gw.POOL_MAXSIZE
         # saving auth data within self to re-auth when needed
         self.auth_request_body = {
             "login_id": user,
@@ -127,9 +156,40 @@ class MIPSClient(gw.HTTPClient):
             "lang": CLIENT_LANG
         }
         self.base_url = base_url
-        self.__ok_auth = False
+        # endpoint urls are fixed per client, built once
+        self._auth_url = f"{base_url}/{AUTH_PATH}"
+        self._devices_url = f"{base_url}/{GET_DEVICES_PATH}"
+        self._patch_backlight_url = f"{base_url}/{PATCH_BACKLIGHT_PATH}"
+        self._backlight_settings_url = f"{base_url}/{GET_BACKLIGHT_SETTINGS_PATH}"  # noqa: E501
+        self._device_tasks_url = f"{base_url}/{GET_DEVICE_TASKS_PATH}"
+        self._ok_auth = False
+        self._auth_lock = threading.Lock()
+        # bumped by every successful auth, tells stale cookies apart
+        self._auth_gen = 0
+        # device_id -> backlight status
+        self._bl_cache = cachetools.TTLCache(
+            maxsize=BACKLIGHT_CACHE_SIZE, ttl=BACKLIGHT_CACHE_TTL
+        )
+        self._bl_lock = threading.Lock()
+        # switch_status -> prepared backlight PUT without cookies
+        self._patch_templates = {}
+        self._patch_templates_lock = threading.Lock()
+        # (device_id, only_status) -> future of an in-flight settings fetch
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._task_list_cache = cachetools.TTLCache(
+            maxsize=TASK_LIST_CACHE_SIZE, ttl=TASK_LIST_CACHE_TTL
+        )
+        self._task_list_lock = threading.Lock()
+        # worker pool shared by concurrent methods, one thread per socket.
+        # Per call concurrency is limited in _submit_limited
+        self._pool = futures.ThreadPoolExecutor(
+            max_workers=pool_maxsize, thread_name_prefix=THREAD_PREFIX
+        )
+        self._pool_size = pool_maxsize
         super().__init__(timeout=timeout, rps_config=rps_config,
-                         rps_config_parsing_mode=rps_config_parsing_mode)
+                         rps_config_parsing_mode=rps_config_parsing_mode,
+                         pool_maxsize=pool_maxsize)
         if not auto_auth:
             return
         if (e := self.auth()) is None:
@@ -143,10 +203,42 @@ class MIPSClient(gw.HTTPClient):
             log.error("auth failed due to an unknown reason")
         raise e
 
+    def _submit_limited(self, fn: Callable, items: list, limit: int,
+                        deadline: Optional[float] = None) -> dict:
+        """
+        Submits fn(item) to the shared pool for each item keeping at most
+        limit of them in flight, other callers keep the rest of the pool.
+        Submitting stops once time.monotonic() passes deadline.
+        Returns future -> item in submission order.
+        """
+        slots = threading.BoundedSemaphore(min(limit, self._pool_size))
+        fs = {}
+        for item in items:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - time.monotonic())
+            if not slots.acquire(timeout=timeout):
+                break
+            fut = self._pool.submit(fn, item)
+            fut.add_done_callback(lambda _: slots.release())
+            fs[fut] = item
+        return fs
+
+    def close(self):
+        "Waits for pooled work to finish and closes the session"
+        self._pool.shutdown(wait=True)
+        self.sesh.close()
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, *exc_info):  # noqa: D105
+        self.close()
+
     def _prepare_auth_req(self) -> requests.PreparedRequest:
         return requests.Request(
             method="POST",
-            url=f"{self.base_url}/{AUTH_PATH}",
+            url=self._auth_url,
             data=self.auth_request_body
         )
     
@@ -154,7 +246,7 @@ class MIPSClient(gw.HTTPClient):
     def response_to_exception(r: requests.Response) -> Exception:
         "Converts status code of a response to an exception"
         if r.status_code == 200:
-            if re.search(pattern=JS_NEEDED_SUBSTRING, string=r.text): 
+            if _JS_NEEDED_BYTES in r.content:
                 return InvalidAUTHError(f"auth is invalid. response text: {r.text}")
             return
         msg = f"status code: {r.status_code}. details: {r.text}"
@@ -165,14 +257,34 @@ class MIPSClient(gw.HTTPClient):
         else:
             return gw.UnexpectedStatusCodeError(msg)
         
-    # mappers
-    @staticmethod
-    def _bool_flag_to_int_param(flag: bool) -> int:
-        "Converts python bool to int that the API understands"
-        if flag:
-            return 1
-        return 0
+    def send_prepared(
+        self,
+        prep: requests.PreparedRequest
+    ) -> requests.Response:
+        """
+        Sends a prepared request. An expired session is signed in again,
+        once for all threads, and the request is resent with new cookies
+        """
+        auth_gen = self._auth_gen
+        try:
+            return super().send_prepared(prep=prep)
+        except InvalidAUTHError as e:
+            # signing in again can't fix the sign in request itself
+            if prep.url == self._auth_url:
+                raise e
+            log.warning("MIPS session expired, authenticating again")
+            with self._auth_lock:
+                # another thread may have signed in meanwhile
+                if self._auth_gen == auth_gen:
+                    self._ok_auth = False
+                    if (auth_err := self.auth()) is not None:
+                        raise auth_err from e
+        retry_prep = prep.copy()
+        retry_prep.headers.pop("Cookie", None)
+        retry_prep.prepare_cookies(self.sesh.cookies)
+        return super().send_prepared(prep=retry_prep)
 
+    # mappers
     def _get_devices_param_to_request(
         self,
         is_online: Optional[bool] = None,
@@ -181,10 +293,11 @@ class MIPSClient(gw.HTTPClient):
             if page is None:
                 page = 1
             if is_online is not None:
-                is_online = self._bool_flag_to_int_param(is_online)
+                # API understands 1/0 flags
+                is_online = int(is_online)
             return requests.Request(
                 method="GET",
-                url=f"{self.base_url}/{GET_DEVICES_PATH}",
+                url=self._devices_url,
                 params={
                     "sort": "-device_name",
                     "is_online": is_online,
@@ -197,23 +310,56 @@ class MIPSClient(gw.HTTPClient):
         device_id: int,
         switch_status: int
     ) -> requests.Request:
-            if switch_status not in BACKLIGHT_PARAM_TO_NAME.keys():
+            if switch_status not in BACKLIGHT_PARAM_TO_NAME:
                 raise ValueError(f"unexpected switch status: {switch_status}")
             return requests.Request(
                 method="PUT",
-                url=f"{self.base_url}/{PATCH_BACKLIGHT_PATH}",
-                data={
-                    "type": 0,
-                    "id": device_id,
-                    "switchStatus": switch_status
-                }
+                url=self._patch_backlight_url,
+                data=self._patch_backlight_params_to_body(
+                    device_id=device_id, switch_status=switch_status
+                )
             )
 
+    @staticmethod
+    def _patch_backlight_params_to_body(device_id: int,
+                                        switch_status: int) -> dict:
+        return {
+            "type": 0,
+            "id": device_id,
+            "switchStatus": switch_status
+        }
+
+    def _prepare_patch_backlight(self, device_id: int,
+                                 switch_status: int) -> requests.PreparedRequest:  # noqa: E501
+        """
+        Copies a prepared PUT template of switch_status and swaps its body,
+        so url parsing and header merging happen once per status.
+        Cookies are merged per copy to pick up the session's current ones
+        """
+        if (template := self._patch_templates.get(switch_status)) is None:
+            with self._patch_templates_lock:
+                if (template := self._patch_templates.get(switch_status)) is None:  # noqa: E501
+                    template = self.make_prepared(
+                        req=self._patch_backlight_params_to_request(
+                            device_id=device_id, switch_status=switch_status
+                        )
+                    )
+                    template.headers.pop("Cookie", None)
+                    self._patch_templates[switch_status] = template
+        prep = template.copy()
+        prep.prepare_cookies(self.sesh.cookies)
+        # template already has the form Content-Type, only body changes
+        prep.body = PATCH_BACKLIGHT_FORM.format(
+            device_id=int(device_id), switch_status=int(switch_status)
+        ).encode()
+        prep.prepare_content_length(prep.body)
+        return prep
+
     
     def _get_backlight_settings_params_to_request(self,device_id: int) -> requests.Request:  # noqa: E501
             return requests.Request(
                 method="GET",
-                url=f"{self.base_url}/{GET_BACKLIGHT_SETTINGS_PATH}",
+                url=self._backlight_settings_url,
                 params={
                     "type": 0,
                     "id": device_id
@@ -223,7 +369,7 @@ class MIPSClient(gw.HTTPClient):
     def _get_device_task_list_params_to_request(self, device_id: int) -> requests.Request:  # noqa: E501
         return requests.Request(
             method="GET",
-            url=f"{self.base_url}/{GET_DEVICE_TASKS_PATH}",
+            url=self._device_tasks_url,
             params={
                 "deviceId": device_id,
                 "page": 1,
@@ -238,27 +384,19 @@ class MIPSClient(gw.HTTPClient):
         r = self.make_request(self._prepare_auth_req())
         if (e := self.response_to_exception(r=r)) is not None:
             return e
-        self.__ok_auth = True
         # TODO this needs to be decoupled from session AND sesh needs to be periodically refreshed, like on every request we check time since last request and update session if needed!
-        # TODO a lock is needed here
-        self.sesh.cookies = r.cookies
-        log.debug("auth ok, cookies updated. len: %s", len(self.sesh.cookies.items()))  # noqa: E501
-        
-    def needs_auth(method: Callable):
-        "Decorator to enforce auth for calling endpoints requiring it"
-        def wrapper(self, *args, **kwargs):
-            if not self.__ok_auth:
-                self.auth()
-            return method(self, *args, **kwargs)
-        return wrapper
-    
-    @needs_auth
-    def get_devices(self, results: Optional[list] = None,
-                    page: Optional[int] = None,
-                    is_online: Optional[bool] = None) -> tuple:
-        "Sends a GET request to /devices-mips recursively until all the pages are processed."  # noqa: E501
-        if results is None:
-            results = []
+        # update keeps the session's RequestsCookieJar instead of swapping it
+        self.sesh.cookies.update(r.cookies)
+        # flipped only once cookies are in place
+        self._auth_gen += 1
+        self._ok_auth = True
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("auth ok, cookies updated. len: %s",
+                      len(self.sesh.cookies))
+
+    def _fetch_devices_page(self, page: int,
+                            is_online: Optional[bool] = None) -> tuple:
+        "Fetches a single page of /devices-mips. Returns (data, max page, err)"
         try:
             r = self.make_request(
                 req=self._get_devices_param_to_request(
@@ -266,20 +404,43 @@ class MIPSClient(gw.HTTPClient):
                 )
             )
         except Exception as e:
-            return None, e
+            return None, None, e
         if (e := self.response_to_exception(r)) is not None:
+            return None, None, e
+        resp_body = orjson.loads(r.content)
+        return resp_body["data"], resp_body["pagination"]["max"], None
+
+    @needs_auth
+    def get_devices(self, is_online: Optional[bool] = None,
+                    th_cap: Optional[int] = None,
+                    max_pages: Optional[int] = None) -> tuple:
+        """
+        Sends GET requests to /devices-mips until all the pages are processed.
+        First page tells the page count, the rest are fetched concurrently.
+        max_pages caps the count of pages fetched when set.
+        """
+        if th_cap is None:
+            th_cap = DEFAULT_THREAD_COUNT
+        results, max_page, e = self._fetch_devices_page(page=1,
+                                                        is_online=is_online)
+        if e is not None:
             return None, e
-        resp_body = r.json()
-        pagination = resp_body["pagination"]
-        # reaching max page is the base case where we return
-        if pagination["page"] == pagination["max"]:
-            return results + resp_body["data"], None
-        # recursive call with page: pagination.page+1 in params
-        return self.get_devices(
-            results=resp_body["data"],
-            page=pagination["page"]+1,
-            is_online=is_online
+        if max_pages is not None:
+            max_page = min(max_page, max_pages)
+        if max_page <= 1:
+            return results, None
+        fs = self._submit_limited(
+            lambda page: self._fetch_devices_page(page=page,
+                                                  is_online=is_online),
+            range(2, max_page+1), th_cap
         )
+        # futures come back in page order
+        for fut in fs:
+            data, _, e = fut.result()
+            if e is not None:
+                return None, e
+            results.extend(data)
+        return results, None
     
     @needs_auth
     def patch_backlight(self, device_id: int,
@@ -294,23 +455,65 @@ class MIPSClient(gw.HTTPClient):
                      device_id)
             return
         try:
-            req = self._patch_backlight_params_to_request(
+            prep = self._prepare_patch_backlight(
                 device_id=device_id, switch_status=switch_status
             )
         except Exception as e:
             log.error("request prep failed: %s", e, exc_info=True)
             return  e
         try:
-            return self.response_to_exception(r=self.make_request(req=req))
+            e = self.response_to_exception(r=self.send_prepared(prep=prep))
         except Exception as e:
             return e
+        if e is None:
+            # status changed, next read has to hit the backend
+            # instead of joining a fetch started before the patch
+            self.invalidate_device(device_id=device_id)
+            with self._inflight_lock:
+                self._inflight.pop((device_id, True), None)
+                self._inflight.pop((device_id, False), None)
+        return e
         
     @needs_auth
     def get_backlight_settings(self, device_id: int,
                                only_status: Optional[bool] = None) -> tuple:
-        "Fetches backlight settings from MIPS backend"
+        """
+        Fetches backlight settings from MIPS backend.
+        Concurrent calls for the same device share a single request.
+        """
         if only_status is None:
             only_status = True
+        key = (device_id, only_status)
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            is_owner = fut is None
+            if is_owner:
+                fut = futures.Future()
+                self._inflight[key] = fut
+        if not is_owner:
+            return fut.result()
+        try:
+            res = self._fetch_backlight_settings(device_id=device_id,
+                                                 only_status=only_status)
+        except Exception as e:
+            fut.set_exception(e)
+            raise e
+        else:
+            fut.set_result(res)
+            return res
+        finally:
+            with self._inflight_lock:
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+
+    def _fetch_backlight_settings(self, device_id: int,
+                                  only_status: bool) -> tuple:
+        "Sends the request behind get_backlight_settings"
+        if only_status:
+            with self._bl_lock:
+                cached = self._bl_cache.get(device_id)
+            if cached is not None:
+                return cached, None
         try:
             r = self.make_request(
                 req=self._get_backlight_settings_params_to_request(device_id=device_id)
@@ -320,17 +523,24 @@ class MIPSClient(gw.HTTPClient):
         if (e := self.response_to_exception(r=r)) is not None:
             return None, e
         
-        body = r.json()
+        body = orjson.loads(r.content)
         if not only_status:
             return body, None
         try:
-            return int(body[BACKLIGHT_STATUS_KEY]), None
+            bl_status = int(body[BACKLIGHT_STATUS_KEY])
         except KeyError:
             return None, ValueError(f"response body has not data for {BACKLIGHT_STATUS_KEY}")  # noqa: E501
+        with self._bl_lock:
+            self._bl_cache[device_id] = bl_status
+        return bl_status, None
                 
     @needs_auth
     def get_device_task_list(self, device_id: int) -> tuple:
         "Fetches most recent tasks associated with a device id"
+        with self._task_list_lock:
+            cached = self._task_list_cache.get(device_id)
+        if cached is not None:
+            return cached, None
         try:
             r = self.make_request(
                 req=self._get_device_task_list_params_to_request(device_id=device_id)
@@ -339,7 +549,18 @@ class MIPSClient(gw.HTTPClient):
             return None, e
         if (e := self.response_to_exception(r=r)) is not None:
             return None, e
-        return r.json(), None
+        tasks = orjson.loads(r.content)
+        # only successful responses are cached
+        with self._task_list_lock:
+            self._task_list_cache[device_id] = tasks
+        return tasks, None
+
+    def invalidate_device(self, device_id: int):
+        "Drops cached backlight status and task list of a device"
+        with self._bl_lock:
+            self._bl_cache.pop(device_id, None)
+        with self._task_list_lock:
+            self._task_list_cache.pop(device_id, None)
     
     @needs_auth
     def patch_backlight_and_validate(self, device_id: int,
@@ -406,56 +627,89 @@ class MIPSClient(gw.HTTPClient):
         if shadow_mode is None:
             shadow_mode = True
 
+        if shadow_mode:
+            # shadow mode sends no requests, no point in spinning up threads
+            results = [
+                self.patch_backlight_and_validate(d, switch_status, shadow_mode)
+                for d in devices
+            ]
+            ts = utils.get_current_timestamp()
+            for res in results:
+                res.end_ts = ts
+            return results
         results = []
         log.debug("starting bulk patching and validation for %s devices with %s threads", len(devices), th_cap)  # noqa: E501
-        with futures.ThreadPoolExecutor(max_workers=th_cap, thread_name_prefix=THREAD_PREFIX) as ex:  # noqa: E501
-            tasks = [
-                MIPSTask(
-                    self.patch_backlight_and_validate,
-                    d, switch_status, shadow_mode
-                ) for d in devices
-            ]
-            fs = {ex.submit(task): device for task, device in zip(tasks, devices)}  # noqa: E501
-            group_timeout = self.timeout * len(fs)
-            done, timed_out = futures.wait(fs, timeout=group_timeout,
-                                           return_when=futures.ALL_COMPLETED)
-            log.debug("%s out of %s devices bulk patched and validated",
-                      len(done), len(done)+len(timed_out))
-           
+        # one request timeout per device leaves room for rps limiter waits
+        # and retries with backoff, which a per wave budget does not
+        group_timeout = self.timeout * len(devices)
+        deadline = time.monotonic() + group_timeout
+        mode = SHADOW_MODE if shadow_mode else PROD_MODE
+        backlight_status = BACKLIGHT_PARAM_TO_NAME[switch_status]
+
+        def work(device: int) -> PatchBacklightAndValidateResult:
+            "Patches a device and stamps when it was done"
+            res = self.patch_backlight_and_validate(device, switch_status,
+                                                    shadow_mode)
+            res.end_ts = utils.get_current_timestamp()
+            return res
+
+        fs = self._submit_limited(work, devices, th_cap, deadline=deadline)
+        pending = set(fs)
+
+        def record(fut: futures.Future):
+            "Appends outcome of a finished future to results"
+            device = fs[fut]
             ts = utils.get_current_timestamp()
-            mode = SHADOW_MODE if shadow_mode else PROD_MODE
-            backlight_status = BACKLIGHT_PARAM_TO_NAME[switch_status]
-            for fut in done:
-                device = fs[fut]
-                try:
-                    res = fut.result()
-                except Exception as e:
-                    log.debug("patch and validate failed for %s: %s", device, e)
-                    results.append(
-                        PatchBacklightAndValidateResult(
-                            device=device, error=e,
-                            start_ts=ts, end_ts=ts,
-                            backlight_status=backlight_status,
-                            mode=mode,
-                        )
-                    )
-                else:
-                    res.end_ts = ts
-                    results.append(res)
-            log.debug("processed %s done items", len(done))
-            
-            for fut in timed_out:
-                device = fs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                log.debug("patch and validate failed for %s: %s", device, e)
                 results.append(
                     PatchBacklightAndValidateResult(
-                        device=device,
-                        error=TimeoutError(f"group timeout ({group_timeout}) breached"),  # noqa: E501
+                        device=device, error=e,
                         start_ts=ts, end_ts=ts,
                         backlight_status=backlight_status,
-                        mode=mode
+                        mode=mode,
                     )
                 )
-                log.debug("patching %s timed out due to group timeout setting", device)  # noqa: E501
-                fut.cancel()
-            log.debug("processed %s timed out items", len(timed_out))
+            else:
+                results.append(res)
+
+        try:
+            # results are recorded as they arrive
+            for fut in futures.as_completed(
+                fs, timeout=max(0, deadline - time.monotonic())
+            ):
+                pending.discard(fut)
+                record(fut)
+        except futures.TimeoutError:
+            log.debug("group timeout (%s) breached", group_timeout)
+        log.debug("%s out of %s devices bulk patched and validated",
+                  len(fs)-len(pending), len(devices))
+
+        # devices whose work never started are dropped and reported as
+        # timed out. Work already talking to MIPS is waited for, so the
+        # logged outcome is what happened to the device and no worker
+        # outlives this call
+        running = {fut for fut in pending if not fut.cancel()}
+        timed_out = [fs[fut] for fut in pending - running]
+        timed_out.extend(devices[len(fs):])
+        ts = utils.get_current_timestamp()
+        for device in timed_out:
+            results.append(
+                PatchBacklightAndValidateResult(
+                    device=device,
+                    error=TimeoutError(f"group timeout ({group_timeout}) breached"),  # noqa: E501
+                    start_ts=ts, end_ts=ts,
+                    backlight_status=backlight_status,
+                    mode=mode
+                )
+            )
+            log.debug("patching %s timed out due to group timeout setting", device)  # noqa: E501
+        if running:
+            log.debug("waiting for %s devices already being patched",
+                      len(running))
+            for fut in futures.as_completed(running):
+                record(fut)
+        log.debug("processed %s timed out items", len(timed_out))
         return results
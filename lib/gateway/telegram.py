@@ -2,12 +2,14 @@
 Module implements a simple gateway to send messages to telegram messenger
 """
 import logging
+import random
+import threading
 import time
 from typing import Optional, Union
+from urllib import parse
 
-import jinja2
+import orjson
 import requests
-import retry
 
 from lib.gateway.base import gw
 
@@ -18,7 +20,11 @@ BASE_URL = "https://api.telegram.org"
 SEND_MSG_ENDPOINT = "sendMessage"
 MARKDOWN_PARSE_MODE = "MarkdownV2"
 HTML_PARSE_MODE = "HTML"
-TAG_TMPL = """<a href="tg://user?id={{ user_to_tag }}">{{ msg }}</a>"""
+# added to telegram's retry_after so waiting senders don't retry in lockstep
+RETRY_AFTER_JITTER = (0, 0.5)
+# sends of a message including the one made after a 429 pause
+TOO_MANY_REQUESTS_TRIES = 2
+TAG_TMPL = """<a href="tg://user?id={user_to_tag}">{msg}</a>"""
 
 class TooManyRequestsError(Exception):
     "Raised when telegram returns a 429"
@@ -30,6 +36,13 @@ class TooManyRequestsError(Exception):
 
 class TelegramGateway(gw.HTTPClient):
     "Sends telegram messages"
+    # 429s carry retry_after in the body, send_message pauses the chat on them
+    retry_on_429 = False
+    # chat id -> monotonic time before which the chat must not be posted to.
+    # Shared by all gateways of the process since limits are per bot & chat
+    _next_ok_at = {}
+    _next_ok_lock = threading.Lock()
+
     def __init__(self, bot_secret: str,
                  chat_id: int, log_chat_id: int,
                  timeout: int, use_session: bool,
@@ -49,6 +62,20 @@ class TelegramGateway(gw.HTTPClient):
         )
         self.base_message_data = {"chat_id": chat_id}
         self.log_message_data = {"chat_id": log_chat_id}
+        # request bodies only differ by text, copied per message
+        self._base_body = {**self.base_message_data,
+                           "parse_mode": HTML_PARSE_MODE}
+        self._log_body = {**self.log_message_data,
+                          "parse_mode": HTML_PARSE_MODE}
+        # prepared POSTs per destination, keyed by is_log
+        self._send_templates = {
+            is_log: self.make_prepared(
+                req=requests.Request(method="POST", url=self.send_msg_url,
+                                     data=body)
+            )
+            for is_log, body in ((False, self._base_body),
+                                 (True, self._log_body))
+        }
     
     @staticmethod
     def response_to_exception(r: requests.Response) -> Exception:
@@ -57,7 +84,7 @@ class TelegramGateway(gw.HTTPClient):
             return
         msg = f"status code: {r.status_code}. details: {r.text}"
         if r.status_code == 429:
-            data = r.json()
+            data = orjson.loads(r.content)
             return TooManyRequestsError(
                 msg=msg,
                 sleep_for=int(data["parameters"]["retry_after"])
@@ -79,53 +106,43 @@ class TelegramGateway(gw.HTTPClient):
     
     @staticmethod
     def _truncate_to_char_limit(msg: str):
+        if len(msg) <= MSG_CHAR_LIMIT:
+            return msg
         return msg[:MSG_CHAR_LIMIT]
     
     @staticmethod
     def _tag_wrapper(msg: str, user_to_tag: int):
-        return jinja2.Template(source=TAG_TMPL).render(
-            user_to_tag=user_to_tag,
-            msg=msg
-        )
+        return TAG_TMPL.format(user_to_tag=user_to_tag, msg=msg)
     
     def _message_params_to_body(self, msg: str, is_log: bool) -> dict:
-        if is_log:
-            return {
-                **self.log_message_data, 
-                **{
-                    "text": self._truncate_to_char_limit(msg=msg),
-                    "parse_mode": HTML_PARSE_MODE
-                }
-            }
-        return {
-            **self.base_message_data,
-            **{
-                "text": self._truncate_to_char_limit(msg=msg),
-                "parse_mode": HTML_PARSE_MODE
-            }
-        }
+        body = (self._log_body if is_log else self._base_body).copy()
+        body["text"] = self._truncate_to_char_limit(msg=msg)
+        return body
     
     def _message_params_to_request(
         self,
         msg: str,
         is_log: bool,
         user_to_tag: Optional[int] = None
-    ) -> requests.Request:
+    ) -> requests.PreparedRequest:
+        """
+        Copies the prepared POST template of the destination chat and swaps
+        its body, so url parsing and header merging happen once per chat
+        """
         if user_to_tag is not None:
             msg = self._tag_wrapper(msg=msg, user_to_tag=user_to_tag)
         msg_data = self._message_params_to_body(
             msg=msg,
             is_log=is_log
         )
-        log.debug("prepared telegram message boby: %s", msg_data)
-        return requests.Request(
-            method="POST",
-            url=self.send_msg_url,
-            data=msg_data
-        )
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("prepared telegram message body: %s", msg_data)
+        prep = self._send_templates[is_log].copy()
+        # template already has the form Content-Type, only body changes
+        prep.body = parse.urlencode(msg_data).encode()
+        prep.prepare_content_length(prep.body)
+        return prep
     
-    @retry.retry(exceptions=(TooManyRequestsError,),
-                 backoff=2, tries=3 ,delay=1, logger=log)
     def send_message(self, msg: str,
                      is_log: Optional[bool] = None,
                      user_to_tag: Optional[int] = None) -> Exception:
@@ -140,20 +157,42 @@ class TelegramGateway(gw.HTTPClient):
         """  # noqa: E501
         if is_log is None:
             is_log = False
-
+        chat_id = (self.log_message_data if is_log
+                   else self.base_message_data)["chat_id"]
         try:
-            self.make_request(
-                req=self._message_params_to_request(
-                    msg=msg, is_log=is_log, user_to_tag=user_to_tag
-                )
+            prep = self._message_params_to_request(
+                msg=msg, is_log=is_log, user_to_tag=user_to_tag
             )
-        except TooManyRequestsError as e:
-            log.debug("TooManyRequestsError hit, sleeping for %s",
-                      e.sleep_for)
-            time.sleep(e.sleep_for)
-            raise e
         except Exception as e:
-            log.error("error sending message: %s", e)
+            log.error("error preparing message: %s", e)
             return e
+        for _ in range(TOO_MANY_REQUESTS_TRIES):
+            self._wait_for_chat(chat_id=chat_id)
+            try:
+                self.send_prepared(prep=prep)
+                return
+            except TooManyRequestsError as e:
+                log.debug("TooManyRequestsError hit, chat %s paused for %s",
+                          chat_id, e.sleep_for)
+                self._pause_chat(chat_id=chat_id, sleep_for=e.sleep_for)
+                err = e
+            except Exception as e:
+                log.error("error sending message: %s", e)
+                return e
+        log.error("error sending message: %s", err.msg)
+        return err
 
+    @classmethod
+    def _wait_for_chat(cls, chat_id: int):
+        "Sleeps until a chat paused by a 429 accepts messages again"
+        to_sleep = cls._next_ok_at.get(chat_id, 0) - time.monotonic()
+        if to_sleep > 0:
+            time.sleep(to_sleep)
 
+    @classmethod
+    def _pause_chat(cls, chat_id: int, sleep_for: float):
+        "Makes every sender of the process wait retry_after for the chat"
+        ok_at = time.monotonic() + sleep_for + random.uniform(*RETRY_AFTER_JITTER)  # noqa: E501
+        with cls._next_ok_lock:
+            if ok_at > cls._next_ok_at.get(chat_id, 0):
+                cls._next_ok_at[chat_id] = ok_at
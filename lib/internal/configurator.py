@@ -4,7 +4,7 @@ Module implements custom config parser
 import logging
 import os
 import pathlib
-from typing import Union
+from typing import Optional, Union
 
 import dotenv
 import yaml
@@ -15,9 +15,40 @@ SECRETS_YAML_KEY = "secrets_yaml"
 GSHEET_CONFIG_KEY = "google_sheets"
 MIPS_CONFIG_KEY = "mips"
 TELEGRAM_CONFIG_KEY = "telegram"
+# keys each section must have, checked before any client is built
+REQUIRED_CONFIG_KEYS = (SECRETS_YAML_KEY, "sleep_between_runs",
+                        GSHEET_CONFIG_KEY, MIPS_CONFIG_KEY,
+                        TELEGRAM_CONFIG_KEY)
+REQUIRED_MIPS_CONFIG_KEYS = ("base_url", "timeout", "rps_config",
+                             "rps_config_parsing_mode")
+REQUIRED_TELEGRAM_CONFIG_KEYS = ("chat_id", "log_chat_id", "timeout",
+                                 "use_session", "user_to_tag", "rps_config",
+                                 "rps_config_parsing_mode")
+REQUIRED_MIPS_SECRET_KEYS = ("user", "password")
+REQUIRED_TELEGRAM_SECRET_KEYS = ("bot_secret",)
+# libyaml backed loader when pyyaml was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(path: Union[str, pathlib.Path]) -> dict:
+    "Safely loads a yaml file, using libyaml when available"
+    with open(file=path, encoding="utf-8") as _f:
+        return yaml.load(stream=_f, Loader=YAML_LOADER)
+
+
+def check_keys(data: dict, keys: tuple, where: str):
+    "Raises ValueError naming every key of keys missing from data"
+    if not isinstance(data, dict):
+        raise ValueError(f"{where} must be a mapping")
+    if missing := [key for key in keys if key not in data]:
+        raise ValueError(f"{where} misses keys: {missing}")
+
 
 class SheetsConfig:
     "Represents configs needed to interact with gsheet API"
+    __slots__ = ("spreadsheet", "tabs", "token", "read_rps", "write_rps",
+                 "request_timeout")
+
     def __init__(
             self,
             spreadsheet: str,
@@ -37,6 +68,9 @@ class SheetsConfig:
 
 class MIPSConfig:
     "Represents configs needed to interact with MIPS API"
+    __slots__ = ("user", "password", "timeout", "base_url", "rps_config",
+                 "rps_config_parsing_mode", "pool_maxsize")
+
     def __init__(
             self,
             user: str,
@@ -44,7 +78,8 @@ class MIPSConfig:
             timeout: int,
             base_url: str,
             rps_config: dict,
-            rps_config_parsing_mode: Union[str,int]
+            rps_config_parsing_mode: Union[str,int],
+            pool_maxsize: Optional[int] = None
         ):
         "Constructor"
         self.user = user
@@ -53,10 +88,15 @@ class MIPSConfig:
         self.base_url = base_url
         self.rps_config = rps_config
         self.rps_config_parsing_mode = rps_config_parsing_mode
+        self.pool_maxsize = pool_maxsize
         
 
 class TelegramConfig:
     "Represents data needed to configure telegram gateway"
+    __slots__ = ("bot_secret", "chat_id", "log_chat_id", "timeout",
+                 "use_session", "user_to_tag", "rps_config",
+                 "rps_config_parsing_mode")
+
     def __init__(
         self,
         bot_secret: str,
@@ -102,20 +142,32 @@ class Configurator:
         self.log_lvl = log_lvl
         
         # configs
-        with open(file=pathlib.Path(config_dir, f"{self.env}.yaml"), encoding="utf-8") as _f:  # noqa: E501
-            config_data = yaml.safe_load(stream=_f)
+        config_data = load_yaml(path=pathlib.Path(config_dir, f"{self.env}.yaml"))  # noqa: E501
+        check_keys(config_data, REQUIRED_CONFIG_KEYS, f"{self.env}.yaml")
+        check_keys(config_data[MIPS_CONFIG_KEY], REQUIRED_MIPS_CONFIG_KEYS,
+                   f"{self.env}.yaml {MIPS_CONFIG_KEY}")
+        check_keys(config_data[TELEGRAM_CONFIG_KEY],
+                   REQUIRED_TELEGRAM_CONFIG_KEYS,
+                   f"{self.env}.yaml {TELEGRAM_CONFIG_KEY}")
         self.sheets = SheetsConfig(**config_data[GSHEET_CONFIG_KEY])
 
         # secrets
-        with open(file=pathlib.Path(config_data[SECRETS_YAML_KEY]), encoding="utf-8") as _f:  # noqa: E501
-            secret_data = yaml.safe_load(stream=_f)
+        secret_data = load_yaml(path=pathlib.Path(config_data[SECRETS_YAML_KEY]))  # noqa: E501
+        check_keys(secret_data, (MIPS_CONFIG_KEY, TELEGRAM_CONFIG_KEY),
+                   "secrets")
+        check_keys(secret_data[MIPS_CONFIG_KEY], REQUIRED_MIPS_SECRET_KEYS,
+                   f"secrets {MIPS_CONFIG_KEY}")
+        check_keys(secret_data[TELEGRAM_CONFIG_KEY],
+                   REQUIRED_TELEGRAM_SECRET_KEYS,
+                   f"secrets {TELEGRAM_CONFIG_KEY}")
         self.mips = MIPSConfig(
             user=secret_data[MIPS_CONFIG_KEY]["user"],
             password=secret_data[MIPS_CONFIG_KEY]["password"],
             base_url=config_data[MIPS_CONFIG_KEY]["base_url"],
             timeout=config_data[MIPS_CONFIG_KEY]["timeout"],
             rps_config=config_data[MIPS_CONFIG_KEY]["rps_config"],
-            rps_config_parsing_mode=config_data[MIPS_CONFIG_KEY]["rps_config_parsing_mode"]
+            rps_config_parsing_mode=config_data[MIPS_CONFIG_KEY]["rps_config_parsing_mode"],
+            pool_maxsize=config_data[MIPS_CONFIG_KEY].get("pool_maxsize")
         )
         self.telegram = TelegramConfig(
             bot_secret=secret_data[TELEGRAM_CONFIG_KEY]["bot_secret"],
@@ -2,9 +2,15 @@
 Module implements custom logging handlers and filters
 """
 import atexit
+import bisect
+import collections
+import html
+import itertools
 import logging
 import pathlib
 import queue
+import threading
+import time
 from logging import config, handlers
 from typing import Optional
 
@@ -12,7 +18,11 @@ from lib.gateway import telegram
 
 # from lib.gateways import tg
 
-_LOG_QUEUE = queue.Queue() # used in logging yaml
+_LOG_QUEUE = queue.SimpleQueue() # used in logging yaml
+# length of chars html.escape(quote=False) expands
+_ESCAPED_LEN = {"&": len("&amp;"), "<": len("&lt;"), ">": len("&gt;")}
+# how long a burst of telegram records is collected before sending
+TG_FLUSH_INTERVAL = 0.5
 
 log = logging.getLogger("main_logger")
 backup_log = logging.getLogger("backup_logger")
@@ -150,50 +160,144 @@ class BackupFileHandler(handlers.TimedRotatingFileHandler):
         :param folder: name of the folder to store our log files
         :param file: name of the log file
         """
-        # First we need to handle creation of a directory for log files
-        folder_path = pathlib.Path(folder)
-        if folder_path.exists():
-            if not folder_path.is_dir():
-                folder_path.mkdir(parents = True)
-        else:
-            folder_path.mkdir(parents = True)
+        # First we need to handle creation of a directory for log files.
+        # A file in place of the folder makes mkdir raise FileExistsError
+        pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
         log_file = pathlib.Path(folder, file)
         # Actually construct our class
         super().__init__(filename=log_file, when="MIDNIGHT", utc=True)
 
 
 class TGHandler(logging.Handler):
-    "Handles logging to telegram"
+    """
+    Handles logging to telegram.
+    Records are buffered and a daemon thread sends them joined into as few
+    messages as MSG_CHAR_LIMIT allows, so a burst costs a handful of POSTs
+    """
     def __init__(self, gw: telegram.TelegramGateway,
-                 user_to_tag_on_error: Optional[int] = None):
+                 user_to_tag_on_error: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
         "Constructor of the class"
+        if flush_interval is None:
+            flush_interval = TG_FLUSH_INTERVAL
         super().__init__()
         self.gw = gw
         self.user_to_tag_on_error = user_to_tag_on_error
+        self.flush_interval = flush_interval
+        # batches leave room for the tag wrapper added to warning+ messages,
+        # so gateway truncation never cuts its closing tag
+        self.char_limit = telegram.MSG_CHAR_LIMIT
+        if user_to_tag_on_error is not None:
+            self.char_limit -= len(telegram.TAG_TMPL.format(
+                user_to_tag=user_to_tag_on_error, msg=""
+            ))
+        # (message, levelno) pairs waiting to be sent
+        self._buffer = collections.deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run,
+                                        name="tg_log_flusher", daemon=True)
+        self._worker.start()
+        # registered before QListenerHandler's listener.stop, so it runs
+        # after the listener has handed over the last records
+        atexit.register(self.close)
+
+    @staticmethod
+    def _escape_to_limit(text: str, limit: int) -> str:
+        """
+        HTML escapes text for telegram's HTML parse mode, cutting the raw
+        text so the escaped result fits limit and no entity is split
+        """
+        text = text[:limit]
+        escaped = html.escape(text, quote=False)
+        if len(escaped) > limit:
+            # keep the longest raw prefix whose escaped form fits
+            sizes = itertools.accumulate(_ESCAPED_LEN.get(c, 1) for c in text)
+            keep = bisect.bisect_right(list(sizes), limit)
+            escaped = html.escape(text[:keep], quote=False)
+        return escaped
 
     def _prepare_message(self, record: logging.LogRecord) -> str:
         """
-        Creates a formatted message using info from the record
+        Creates a formatted message using info from the record.
+        Record text is escaped, so one record can't break the HTML of
+        the batch it is sent with
         """
-        msg_str = f"{self.format(record)}"
+        prefix = ""
         # Add urgency if record message is above warning + tag POCs
         if record.levelno >= 30:
-            msg_str = f"\u26A0\uFE0F {msg_str}"
-        return msg_str
-
-    def _log_to_tg(self, record: logging.LogRecord) -> None:
-        if self.user_to_tag_on_error is not None and record.levelno >= 30:
-            self.gw.send_message(
-                msg=self._prepare_message(record=record),
-                is_log=True, user_to_tag=self.user_to_tag_on_error
-            )
-            return
-        self.gw.send_message(
-            msg=self._prepare_message(record=record), is_log=True
+            prefix = "\u26A0\uFE0F "
+        return prefix + self._escape_to_limit(
+            text=self.format(record), limit=self.char_limit - len(prefix)
         )
 
+    def _log_to_tg(self, msg: str, levelno: int) -> Optional[Exception]:
+        if self.user_to_tag_on_error is not None and levelno >= 30:
+            return self.gw.send_message(
+                msg=msg, is_log=True, user_to_tag=self.user_to_tag_on_error
+            )
+        return self.gw.send_message(msg=msg, is_log=True)
+
+    def _drain_batches(self):
+        "Yields (message, max levelno) chunks joined from the buffer"
+        parts, size, levelno = [], 0, 0
+        while self._buffer:
+            msg, msg_level = self._buffer.popleft()
+            # +1 accounts for the newline joining the parts
+            if parts and size + len(msg) + 1 > self.char_limit:
+                yield "\n".join(parts), levelno
+                parts, size, levelno = [], 0, 0
+            parts.append(msg)
+            size += len(msg) + 1
+            levelno = max(levelno, msg_level)
+        if parts:
+            yield "\n".join(parts), levelno
+
+    def flush(self) -> None:
+        """
+        Sends everything buffered so far
+        """
+        with self._flush_lock:
+            for msg, levelno in self._drain_batches():
+                try:
+                    e = self._log_to_tg(msg=msg, levelno=levelno)
+                except Exception as exc:
+                    e = exc
+                if e is not None:
+                    # the batch is kept in the backup log instead of lost
+                    backup_log.error("failed to send log batch to tg: %s. "
+                                     "batch:\n%s", e, msg)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            if self._closed:
+                return
+            # let the rest of a burst accumulate before sending
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
     def emit(self, record: logging.LogRecord) -> None:
         """
-        Actually performs logging
+        Buffers the record, the flusher thread sends it
+        """
+        try:
+            self._buffer.append((self._prepare_message(record=record),
+                                 record.levelno))
+        except Exception:
+            self.handleError(record)
+            return
+        self._wakeup.set()
+
+    def close(self) -> None:
+        """
+        Stops the flusher thread and sends what is left in the buffer
         """
-        self._log_to_tg(record=record)
\ No newline at end of file
+        if not self._closed:
+            self._closed = True
+            self._wakeup.set()
+            self._worker.join()
+            self.flush()
+        super().close()
@@ -2,7 +2,6 @@
 Module implements TimerContext.
 It simplifies logging code's execution time.
 """
-import threading
 import time
 
 
@@ -10,22 +9,15 @@ class TimerContext:
     """
     Class is meant to facilitate timing of other funcs and methods
     """
-
-    def __init__(self):
-        """Instantiates the class with threading lock as an attr"""
-        self.lock = threading.Lock()
+    __slots__ = ("start_ns", "end_ns", "elapsed")
 
     def __enter__(self):
         """Context manager dunder method to facilitate catching start time"""
-        self.start_time = int(time.time() * 1000)
+        self.start_ns = time.monotonic_ns()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager dunder method to facilitate catching end time"""
-        # Doing with a lock here to avoid race conditions
-        with self.lock:
-            self.end_time = int(time.time() * 1000)
-        elapsed = round((self.end_time - self.start_time) / 1000, 2)
-        # Doing with a lock here to avoid race conditions
-        with self.lock:
-            self.elapsed = elapsed
\ No newline at end of file
+        # every timing gets its own instance, so there is nothing to lock
+        self.end_ns = time.monotonic_ns()
+        self.elapsed = round((self.end_ns - self.start_ns) / 1e9, 2)
\ No newline at end of file
@@ -4,6 +4,8 @@ Module implements utils that are used by other parts of the project
 from datetime import datetime, timezone
 from typing import Optional, Union
 
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 
 def get_current_timestamp(
         utc: Optional[bool] = None,
@@ -25,7 +27,7 @@ def get_current_timestamp(
     if as_string is None:
         as_string = True
     if format is None:
-        format = "%Y-%m-%d %H:%M:%S"
+        format = DEFAULT_TIMESTAMP_FORMAT
     
     if utc:
         now = datetime.now(tz=timezone.utc)
@@ -33,4 +35,8 @@ def get_current_timestamp(
         now = datetime.now()
     if not as_string:
         return now
+    if format == DEFAULT_TIMESTAMP_FORMAT:
+        # hand formatting skips strftime's format parsing
+        return (f"{now.year:04d}-{now.month:02d}-{now.day:02d} "
+                f"{now.hour:02d}:{now.minute:02d}:{now.second:02d}")
     return now.strftime(format=format)
\ No newline at end of file
@@ -16,17 +16,21 @@ import yaml
 
 RETENTION_DAYS = 7
 LOG_PATTERN = ".log."
+SECONDS_IN_DAY = 3600 * 24
 
-def _get_creation_time(filepath: str) -> float:
-    if platform.system() == "Windows":
-        return os.path.getctime(filename=filepath)
-    stat = os.stat(path=filepath).st_mtime
-    try:
-        return stat.st_birthtime
-    except AttributeError:
-        # We're probably on Linux. No easy way to get creation dates here,
-        # so we'll settle for when it was last modified
-        return stat.st_mtime
+_IS_WINDOWS = platform.system() == "Windows"
+
+
+def _ctime_windows(stat: os.stat_result) -> float:
+    return stat.st_ctime
+
+def _ctime_posix(stat: os.stat_result) -> float:
+    # st_birthtime is there on macOS / BSD. We're probably on Linux otherwise.
+    # No easy way to get creation dates here,
+    # so we'll settle for when it was last modified
+    return getattr(stat, "st_birthtime", stat.st_mtime)
+
+_get_creation_time = _ctime_windows if _IS_WINDOWS else _ctime_posix
 
 def clean_log_files(path: str, delete=False):
     """Helper func to periodically delete old log files
@@ -35,17 +39,19 @@ def clean_log_files(path: str, delete=False):
         path (str): path where to search for log files
         delete (bool, optional): True means files are deleted. Defaults to False.
     """
-    search_root = pathlib.Path(path)
-    print(f"cleaning files in {search_root.absolute()}")
-    for f in search_root.iterdir():
-        if LOG_PATTERN not in f.name or not f.is_file():
-            continue
-        created_or_modified = _get_creation_time(f.absolute())
-        days_elapsed = int((time.time() - created_or_modified) / (3600 * 24))
-        print(f"{f.name} is a log file days elapsed: {days_elapsed}")
-        if days_elapsed > RETENTION_DAYS and delete:
-            print(f"calling .unlink on {f.name}", )
-            f.unlink()
-
-        
-
+    print(f"cleaning files in {pathlib.Path(path).absolute()}")
+    now = time.time()
+    # files older than RETENTION_DAYS full days are deleted
+    cutoff = now - (RETENTION_DAYS + 1) * SECONDS_IN_DAY
+    # DirEntry carries the file type from the directory read, and its stat
+    # is cached (free on Windows), so each file costs at most one stat
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if LOG_PATTERN not in entry.name or not entry.is_file():
+                continue
+            created_or_modified = _get_creation_time(entry.stat())
+            days_elapsed = int((now - created_or_modified) / SECONDS_IN_DAY)
+            print(f"{entry.name} is a log file days elapsed: {days_elapsed}")
+            if created_or_modified <= cutoff and delete:
+                print(f"calling .unlink on {entry.name}", )
+                os.unlink(entry.path)
@@ -24,6 +24,7 @@ _PATCH_BACKLIGHT_PARAM_NAMES = {
 # sheet columns
 TOGGLE_COL = "toggle"
 HOURS_TO_RUN_COL = "hours_to_run"
+_HOURS_LC_COL = "_hours_to_run_lc"
 WORKFLOW_COL = "workflow"
 ARGS_COL = "arguments"
 MODE_COL = "mode"
@@ -31,6 +32,9 @@ MODE_COL = "mode"
 SHADOW_MODE_NAME = "shadow"
 TOGGLE_ON = "on"
 ALL_HOURS = "all"
+# workflows mostly wait on MIPS / sheets, whose rps limiters cap throughput
+MAX_WORKFLOW_THREADS = 8
+WORKFLOW_THREAD_PREFIX = "wf_"
 
 
 class WorkflowError(Exception):
@@ -73,6 +77,17 @@ class WorkflowResult:
             "mode": self.mode
         }
 
+    @staticmethod
+    def to_columns(results: list) -> dict:
+        "Converts a list of instances to a dict of columns"
+        return {
+            "workflow": [r.workflow for r in results],
+            "start_ts": [r.start_ts for r in results],
+            "end_ts": [r.end_ts for r in results],
+            "error": [r.error for r in results],
+            "mode": [r.mode for r in results]
+        }
+
 
 class App:
     "Abstraction that uses lower level objects to execute MIPS tasks"  
@@ -93,18 +108,22 @@ class App:
         self.mips_api_client = mips_api_client
         self.telegram = telegram
         self.cfg = cfg
+        # workflow name -> bound method executing it
+        self._workflows = {
+            PATCH_BACKLIGHT_WORKFLOW_NAME: self.patch_backlight
+        }
 
-    def _task_name_to_executable(self, name: str):
-        if name == PATCH_BACKLIGHT_WORKFLOW_NAME:
-            return self.patch_backlight        
+    def _task_name_to_executable(self, name: str) -> Optional[Callable]:
+        return self._workflows.get(name)
 
     def _task_args_to_workflow_args(self, task: dict) -> list:
-        args = [a.strip() for a in task[ARGS_COL].split(",")]
-        cnt_args = len(args)
         if task[WORKFLOW_COL] == PATCH_BACKLIGHT_WORKFLOW_NAME:
-            if cnt_args > 1:
-                raise ValueError("wrong number of args")
-            return [task[MODE_COL], _PATCH_BACKLIGHT_PARAM_NAMES[args[0]]]
+            # unpacking fails on any arg count other than one
+            try:
+                (arg,) = map(str.strip, task[ARGS_COL].split(","))
+            except ValueError:
+                raise ValueError("wrong number of args") from None
+            return [task[MODE_COL], _PATCH_BACKLIGHT_PARAM_NAMES[arg]]
     
     def _task_data_to_workflow_task(self, task: dict) -> tuple:
         if (executable := self._task_name_to_executable(task[WORKFLOW_COL])) is None:  # noqa: E501
@@ -137,26 +156,37 @@ class App:
         if e is not None:
             return WorkflowError(f"execute_tasks failed to fetch tasks from sheet: {e}")  # noqa: E501
         log.info("fetched %s tasks from sheet", len(task_data))
-        task_data = task_data.filter(
-            # toggle is on
-            (pl.col(TOGGLE_COL)==TOGGLE_ON)
-            & (
-                # either hour matches
-                pl.col(HOURS_TO_RUN_COL).str.to_lowercase()
-                .str.split(by=",").list.contains(str(datetime.now(tz=timezone.utc).hour))
-                # or input contains "all"
-                | pl.col(HOURS_TO_RUN_COL).str.to_lowercase().
-                str.contains(ALL_HOURS) 
+        current_hour = str(datetime.now(tz=timezone.utc).hour)
+        task_data = (
+            task_data
+            # hours are lowercased once for both checks below
+            .with_columns(pl.col(HOURS_TO_RUN_COL).str.to_lowercase()
+                          .alias(_HOURS_LC_COL))
+            .filter(
+                # toggle is on
+                (pl.col(TOGGLE_COL)==TOGGLE_ON)
+                & (
+                    # either hour matches
+                    pl.col(_HOURS_LC_COL).str.split(by=",")
+                    .list.contains(current_hour)
+                    # or input contains "all"
+                    | pl.col(_HOURS_LC_COL).str.contains(ALL_HOURS,
+                                                         literal=True)
+                )
             )
+            .drop(_HOURS_LC_COL)
         )
         if len(task_data) == 0:
             log.info("no enabled tasks, nothing to do")
             return
         
         log.info("%s tasks to execute after filtering", len(task_data))
-        with futures.ThreadPoolExecutor(max_workers=len(task_data)) as ex:
+        with futures.ThreadPoolExecutor(
+            max_workers=min(len(task_data), MAX_WORKFLOW_THREADS),
+            thread_name_prefix=WORKFLOW_THREAD_PREFIX
+        ) as ex:
             workflows = []
-            for task in task_data.to_dicts():
+            for task in task_data.iter_rows(named=True):
                 wf_task, e = self._task_data_to_workflow_task(
                     task=task
                 )
@@ -166,14 +196,18 @@ class App:
                 workflows.append(ex.submit(
                     wf_task.executable, *wf_task.args
                 ))
-            # exceptions are handled downstream so no try / except here
-            results = [fut.result() for fut in futures.as_completed(workflows)]
+            # exceptions are handled downstream so no try / except here.
+            # results keep the control panel order whatever finishes first
+            results = [None] * len(workflows)
+            fut_to_idx = {fut: i for i, fut in enumerate(workflows)}
+            for fut in futures.as_completed(fut_to_idx):
+                results[fut_to_idx[fut]] = fut.result()
         log.info("%s tasks executed. result count: %s",
                  len(workflows), len(results))
         e = self.sheets.append_data(
             sheet_id=self.cfg.sheets.spreadsheet,
             tab_name=self.cfg.sheets.tabs["execute_logs"]["name"],
-            data=pl.DataFrame(data=[r.to_dict() for r in results]),
+            data=pl.DataFrame(data=WorkflowResult.to_columns(results)),
             row_limit=self.cfg.sheets.tabs["execute_logs"]["row_limit"],
             schema=self.cfg.sheets.tabs["execute_logs"]["schema"]
         )
@@ -205,15 +239,16 @@ class App:
             mode=mode
         )
         devices, e = self.mips_api_client.get_devices()
-        log.info("fetched %s devices", len(devices))
         if e is not None:
             result.error = WorkflowError(f"patch_backlight failed to get devices: {e}")
             result.end_ts = utils.get_current_timestamp()
             return result
-        devices = {int(device["id"]) for device in devices}
+        log.info("fetched %s devices", len(devices))
+        # dedups ids in one pass, keeping the order MIPS listed them in
+        devices = list(dict.fromkeys(int(device["id"]) for device in devices))
         log.info("converted devices to a list of ids")
         results = self.mips_api_client.patch_backlight_and_validate_bulk(
-            devices=list(devices),
+            devices=devices,
             switch_status=switch_status,
             shadow_mode=(mode == SHADOW_MODE_NAME)
         )
@@ -222,7 +257,9 @@ class App:
         e = self.sheets.append_data(
             sheet_id=self.cfg.sheets.spreadsheet,
             tab_name=self.cfg.sheets.tabs["patch_backlight_logs"]["name"],
-            data=pl.DataFrame(data=[r.to_dict() for r in results]),
+            data=pl.DataFrame(
+                data=mips.PatchBacklightAndValidateResult.to_columns(results)
+            ),
             row_limit=self.cfg.sheets.tabs["patch_backlight_logs"]["row_limit"],
             schema=self.cfg.sheets.tabs["patch_backlight_logs"]["schema"]
         )
@@ -4,42 +4,47 @@ Main entry point of the application.
 import logging.config
 import time
 
-import yaml
-
 from lib import log_cleaner, mips_app, setup
 from lib.gateway import google_sheets, mips
-from lib.internal import timer
+from lib.internal import configurator, timer
 
 # logging setup
-with open("config/logging.yaml") as _f:
-    LOG_CFG = yaml.safe_load(_f)
+LOG_CFG = configurator.load_yaml(path="config/logging.yaml")
 logging.config.dictConfig(LOG_CFG)
 log = logging.getLogger("main_logger")
 
 
-def main():
-    "Encompasses main logic"
-    log.info("starting execution in %s", setup.app_config.env)
-    # dependencies configuration
-    app = mips_app.App(
-            sheets=google_sheets.GoogleSheetsGateway(
+def new_mips_client() -> mips.MIPSClient:
+    "Builds MIPS API client from app config"
+    return mips.MIPSClient(
+        user=setup.app_config.mips.user,
+        password=setup.app_config.mips.password,
+        timeout=setup.app_config.mips.timeout,
+        base_url=setup.app_config.mips.base_url,
+        rps_config=setup.app_config.mips.rps_config,
+        rps_config_parsing_mode=setup.app_config.mips.rps_config_parsing_mode,
+        pool_maxsize=setup.app_config.mips.pool_maxsize
+    )
+
+
+def build_app(mips_api_client: mips.MIPSClient) -> mips_app.App:
+    "Wires the application with its dependencies"
+    return mips_app.App(
+        sheets=google_sheets.GoogleSheetsGateway(
             service_acc_path=setup.app_config.sheets.token,
             read_rps=setup.app_config.sheets.read_rps,
             write_rps=setup.app_config.sheets.write_rps,
             request_timeout=setup.app_config.sheets.request_timeout
         ),
-        mips_api_client=mips.MIPSClient(
-            user=setup.app_config.mips.user,
-            password=setup.app_config.mips.password,
-            timeout=setup.app_config.mips.timeout,
-            base_url=setup.app_config.mips.base_url,
-            rps_config=setup.app_config.mips.rps_config,
-            rps_config_parsing_mode=setup.app_config.mips.rps_config_parsing_mode
-        ),
+        mips_api_client=mips_api_client,
         telegram=setup.TG_GW,
         cfg=setup.app_config
     )
-    
+
+
+def main(app: mips_app.App):
+    "Encompasses main logic"
+    log.info("starting execution in %s", setup.app_config.env)
     e = app.execute_tasks()
     if e is not None:
         log.error("tasks execution resulted in an error: %s", e, exc_info=True)
@@ -48,28 +53,38 @@ def main():
 
 
 if __name__ == "__main__":
-    while True:
-        try:
+    # dependencies are built once, so sessions, MIPS auth and thread pools
+    # are reused by every iteration. A failed build is logged like any
+    # other iteration error and retried on the next one
+    mips_api_client = None
+    app = None
+    try:
+        while True:
             try:
-                with timer.TimerContext() as custom_timer:
-                    main()
-            except Exception as e:
-                log.error("exception in main: %s", e)
-            finally:
-                log.info("completed an iteartion in %s sec",
-                        custom_timer.elapsed)
-                if setup.app_config.env == setup.DEV_ENV:
-                    log.info("stopping loop because env is %s",
-                            setup.app_config.env)
-                    break
-                log_cleaner.clean_log_files(path="./logs", delete=True)
-                to_sleep = round(setup.app_config.sleep_between_runs - custom_timer.elapsed, 2)  # noqa: E501
-                log.info("sleeping for %s minutes before next iteration",
-                        round(to_sleep/60, 2))
-                time.sleep(to_sleep)
-        except KeyboardInterrupt:
-            log.error("received a termination signal from user")
-            break
-
-            
-
+                try:
+                    with timer.TimerContext() as custom_timer:
+                        if mips_api_client is None:
+                            mips_api_client = new_mips_client()
+                        if app is None:
+                            app = build_app(mips_api_client=mips_api_client)
+                        main(app=app)
+                except Exception as e:
+                    log.error("exception in main: %s", e)
+                finally:
+                    log.info("completed an iteartion in %s sec",
+                            custom_timer.elapsed)
+                    if setup.app_config.env == setup.DEV_ENV:
+                        log.info("stopping loop because env is %s",
+                                setup.app_config.env)
+                        break
+                    log_cleaner.clean_log_files(path="./logs", delete=True)
+                    to_sleep = round(setup.app_config.sleep_between_runs - custom_timer.elapsed, 2)  # noqa: E501
+                    log.info("sleeping for %s minutes before next iteration",
+                            round(to_sleep/60, 2))
+                    time.sleep(to_sleep)
+            except KeyboardInterrupt:
+                log.error("received a termination signal from user")
+                break
+    finally:
+        if mips_api_client is not None:
+            mips_api_client.close()